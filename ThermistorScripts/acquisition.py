@@ -0,0 +1,51 @@
+# Background thread that collects samples at a fixed interval, independent of the plotting loop
+import logging
+import threading
+from scheduler import Scheduler
+
+class AcquisitionThread(threading.Thread):
+
+    # acquire(cycle, skipped) is called once per interval with the index of the current cycle and the
+    # number of cycles skipped right before it (see scheduler.LATE_POLICIES). An interval of 0 calls it
+    # back to back for reads that wait on the hardware themselves, numCycles = None keeps collecting
+    # until stop() is called
+    def __init__(self, acquire, interval, numCycles = None, late = 'catchup'):
+        super().__init__(name = 'acquisition', daemon = True)
+        self.acquire = acquire
+        self.numCycles = numCycles
+        self.scheduler = Scheduler(interval, late)
+
+        self.cycleCount = 0
+        self.skipped = 0
+        self.error = None
+        self.stopEvent = threading.Event()
+
+    def run(self):
+        self.scheduler.start()
+        skipped = 0
+
+        try:
+            while not self.stopEvent.is_set():
+                if self.numCycles is not None and self.scheduler.slot >= self.numCycles:
+                    logging.info('Final time reached, data collection finished.')
+                    break
+
+                self.acquire(self.scheduler.slot, skipped)
+                self.cycleCount += 1
+
+                skipped = self.scheduler.advance()
+                if skipped:
+                    self.skipped += skipped
+                    logging.warning(f'Data collection fell behind, skipped {skipped} samples ({self.skipped} so far).')
+
+                # Wait for the next cycle, returning early if stop() is called
+                self.scheduler.wait(self.stopEvent)
+
+        except Exception as error:
+            self.error = error
+            logging.exception('Data collection stopped after an error.')
+
+    # Ask the thread to finish and wait for the cycle in progress to complete
+    def stop(self):
+        self.stopEvent.set()
+        self.join()
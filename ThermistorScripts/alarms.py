@@ -0,0 +1,318 @@
+# Alarm rules checked on every acquired block, so a channel that leaves its safe range is reported within
+# the block it happens in instead of waiting for someone to notice it in the plot. Every rule is evaluated
+# for all its channels and all samples of a block at once, and actions run on their own threads so a slow
+# command or an unreachable socket never holds up acquisition. An alarm file sets the rules and actions
+# in JSON, channels are named as in the recording (thermistor IDs for temp_DAQ.py) and default to all:
+#
+#   {
+#       "rules": [
+#           {"type": "limit", "channels": ["1", "2"], "low": 5.0, "high": 35.0, "deadband": 0.2},
+#           {"type": "rate", "max": 0.5, "window": 60},
+#           {"type": "deviation", "channels": ["1", "2", "3", "4"], "max": 1.0},
+#           {"type": "sensor", "open": 1e6, "short": 100}
+#       ],
+#       "actions": [
+#           {"type": "log"},
+#           {"type": "command", "command": ["notify-send", "Thermistor alarm", "{message}"]},
+#           {"type": "socket", "address": "localhost:9100"}
+#       ]
+#   }
+#
+# 'limit'     - value below low or above high
+# 'rate'      - value changing faster than max per minute, measured over the last window seconds
+# 'deviation' - value further than max from the median of the rule's channels
+# 'sensor'    - open or shorted sensor, resistance above open or below short ohms or not finite
+#
+# An alarm is raised when its condition is met and cleared once the value is back by deadband (0 by default)
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+import subprocess
+import numpy as np
+
+class AlarmRule:
+
+    def __init__(self, settings, channelNames):
+        self.settings = settings
+        self.channels = [channelNames.index(str(name)) for name in settings.get('channels', channelNames)]
+        self.names = [channelNames[index] for index in self.channels]
+        self.deadband = settings.get('deadband', 0.0)
+
+    # (quantity, raise, hold) of a block, each (samples, rule channels). hold is the looser condition an
+    # alarm that is already raised stays raised under
+    def evaluate(self, times, values, resistances):
+        raise NotImplementedError
+
+    def message(self, name, quantity):
+        raise NotImplementedError
+
+class LimitRule(AlarmRule):
+
+    def __init__(self, settings, channelNames):
+        super().__init__(settings, channelNames)
+        self.low = settings.get('low', -np.inf)
+        self.high = settings.get('high', np.inf)
+
+    def evaluate(self, times, values, resistances):
+        quantity = values[:, self.channels]
+        return quantity, (quantity < self.low) | (quantity > self.high), (quantity < self.low + self.deadband) | (quantity > self.high - self.deadband)
+
+    def message(self, name, quantity):
+        if quantity > self.high:
+            return f'{name} at {quantity:.3f}, above {self.high:g}'
+        return f'{name} at {quantity:.3f}, below {self.low:g}'
+
+# Compares every sample with the one lag samples before it, lag samples cover window seconds at the
+# sample interval. The last lag samples are kept between blocks
+class RateRule(AlarmRule):
+
+    def __init__(self, settings, channelNames, sampleInterval):
+        super().__init__(settings, channelNames)
+        self.max = settings['max']
+        self.window = settings.get('window', 60.0)
+        self.lag = max(1, int(round(self.window / sampleInterval)))
+
+        self.times = np.zeros(self.lag)
+        self.values = np.zeros((self.lag, len(self.channels)))
+        self.seen = 0
+
+    def evaluate(self, times, values, resistances):
+        values = values[:, self.channels]
+
+        # Position of the sample lag samples back, in the kept samples or earlier in this block
+        lagIndex = self.seen + np.arange(len(times)) - self.lag
+        kept = lagIndex < self.seen
+        inBlock = np.maximum(lagIndex - self.seen, 0)
+        lagTimes = np.where(kept, self.times[lagIndex % self.lag], times[inBlock])
+        lagValues = np.where(kept[:, np.newaxis], self.values[lagIndex % self.lag], values[inBlock])
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            quantity = (values - lagValues) / (times - lagTimes)[:, np.newaxis] * 60
+        quantity[lagIndex < 0] = np.nan
+
+        keep = slice(max(0, len(times) - self.lag), None)
+        positions = (self.seen + np.arange(len(times))[keep]) % self.lag
+        self.times[positions] = times[keep]
+        self.values[positions] = values[keep]
+        self.seen += len(times)
+
+        magnitude = np.abs(quantity)
+        return quantity, magnitude > self.max, magnitude > self.max - self.deadband
+
+    def message(self, name, quantity):
+        return f'{name} changing by {quantity:.3f} per minute over {self.window:g} s, faster than {self.max:g}'
+
+class DeviationRule(AlarmRule):
+
+    def __init__(self, settings, channelNames):
+        super().__init__(settings, channelNames)
+        self.max = settings['max']
+
+    def evaluate(self, times, values, resistances):
+        values = values[:, self.channels]
+
+        # A group without a single finite value has no median, its channels are left to the sensor rule.
+        # Only the other samples are passed to nanmedian, which would warn about them
+        median = np.full((len(values), 1), np.nan)
+        grouped = np.isfinite(values).any(axis = 1)
+        median[grouped] = np.nanmedian(values[grouped], axis = 1, keepdims = True)
+        quantity = values - median
+
+        magnitude = np.abs(quantity)
+        return quantity, magnitude > self.max, magnitude > self.max - self.deadband
+
+    def message(self, name, quantity):
+        return f'{name} {quantity:+.3f} from the median of its group, more than {self.max:g}'
+
+class SensorRule(AlarmRule):
+
+    def __init__(self, settings, channelNames):
+        super().__init__(settings, channelNames)
+        self.open = settings.get('open', np.inf)
+        self.short = settings.get('short', 0.0)
+
+    def evaluate(self, times, values, resistances):
+        quantity = resistances[:, self.channels]
+        fault = ~((quantity >= self.short) & (quantity <= self.open))
+        return quantity, fault, fault
+
+    # Open and shorted channels both read NaN resistance, only a finite resistance tells them apart
+    def message(self, name, quantity):
+        if not np.isfinite(quantity):
+            return f'{name} sensor open or shorted, reading outside the divider range'
+        return f'{name} sensor {"shorted" if quantity < self.short else "open"}, {quantity:.6g} ohm'
+
+RULE_TYPES = {'limit': LimitRule, 'rate': RateRule, 'deviation': DeviationRule, 'sensor': SensorRule}
+
+# Runs an action for every alarm event handed to it, on its own thread
+class AlarmAction(threading.Thread):
+
+    def __init__(self, name):
+        super().__init__(name = name, daemon = True)
+        self.events = queue.Queue()
+
+    def run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            try:
+                self.handle(event)
+            except Exception:
+                logging.exception(f'Alarm action {self.name} failed.')
+
+    # Finish the events already handed over and stop
+    def stop(self):
+        self.events.put(None)
+        self.join()
+
+    def handle(self, event):
+        raise NotImplementedError
+
+class LogAction(AlarmAction):
+
+    def __init__(self, settings):
+        super().__init__('alarm log')
+
+    def handle(self, event):
+        if event['state'] == 'raised':
+            logging.warning(f'ALARM at {event["time"]:.3f} s: {event["message"]}.')
+        else:
+            logging.info(f'Alarm cleared at {event["time"]:.3f} s: {event["channel"]} {event["rule"]}.')
+
+# Runs command with every argument formatted with the event fields, such as {message} or {channel}
+class CommandAction(AlarmAction):
+
+    def __init__(self, settings):
+        super().__init__('alarm command')
+        self.command = settings['command']
+        self.timeout = settings.get('timeout', 10.0)
+        self.states = settings.get('states', ['raised'])
+
+    def handle(self, event):
+        if event['state'] in self.states:
+            subprocess.run([argument.format(**event) for argument in self.command], timeout = self.timeout, check = True)
+
+# Event as one line of strict JSON, values of open or shorted channels are NaN and are sent as null
+def eventJson(event):
+    fields = {key: None if isinstance(value, float) and not np.isfinite(value) else value for key, value in event.items()}
+    return json.dumps(fields, allow_nan = False) + '\n'
+
+# Sends every event as one line of JSON to a TCP listener, connecting again after an error
+class SocketAction(AlarmAction):
+
+    def __init__(self, settings):
+        super().__init__('alarm socket')
+        host, _, port = settings['address'].rpartition(':')
+        self.address = (host or 'localhost', int(port))
+        self.timeout = settings.get('timeout', 2.0)
+        self.connection = None
+
+    def handle(self, event):
+        try:
+            if self.connection is None:
+                self.connection = socket.create_connection(self.address, timeout = self.timeout)
+            self.connection.sendall(eventJson(event).encode())
+        except OSError as error:
+            logging.warning(f'Could not send the alarm to {self.address[0]}:{self.address[1]}: {error}.')
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+
+    def stop(self):
+        super().stop()
+        if self.connection is not None:
+            self.connection.close()
+
+ACTION_TYPES = {'log': LogAction, 'command': CommandAction, 'socket': SocketAction}
+
+# Checks every rule on each block and hands raised and cleared alarms to the actions. Each alarm is one
+# rule on one channel
+class AlarmEngine:
+
+    def __init__(self, rules, actions):
+        self.rules = rules
+        self.actions = actions
+        self.alarms = [(rule, name) for rule in rules for name in rule.names]
+        self.active = np.zeros(len(self.alarms), dtype = bool)
+
+        for action in self.actions:
+            action.start()
+
+    # Check a block of samples, values and resistances have shape (samples, channels). Returns the events
+    # of the alarms raised or cleared during the block, already handed to the actions
+    def check(self, times, values, resistances = None):
+        times = np.asarray(times, dtype = float)
+        results = [rule.evaluate(times, values, resistances) for rule in self.rules]
+        quantity = np.concatenate([result[0] for result in results], axis = 1)
+        raised = np.concatenate([result[1] for result in results], axis = 1)
+        held = np.concatenate([result[2] for result in results], axis = 1)
+
+        # An alarm is active at a sample if it was raised at or before it and held ever since. Compare the
+        # last sample it was raised at with the last sample it was not held at, an alarm active before the
+        # block counts as raised just before it
+        samples = np.arange(len(times))[:, np.newaxis]
+        lastRaised = np.maximum.accumulate(np.where(raised, samples, np.where(self.active, -1, -2)), axis = 0)
+        lastReleased = np.maximum.accumulate(np.where(held, -2, samples), axis = 0)
+        active = lastRaised > lastReleased
+
+        changed = active != np.vstack((self.active[np.newaxis], active[:-1]))
+        self.active = active[-1]
+        if not changed.any():
+            return []
+
+        events = []
+        for sample, index in zip(*np.nonzero(changed)):
+            rule, name = self.alarms[index]
+            event = {
+                'state': 'raised' if active[sample, index] else 'cleared',
+                'time': times[sample],
+                'utc': time.time(),
+                'channel': name,
+                'rule': rule.settings['type'],
+                'value': quantity[sample, index],
+                'message': rule.message(name, quantity[sample, index]),
+            }
+            events.append(event)
+            for action in self.actions:
+                action.events.put(event)
+        return events
+
+    # Names and rules of the alarms active after the last block
+    def activeAlarms(self):
+        return [(name, rule.settings['type']) for (rule, name), active in zip(self.alarms, self.active) if active]
+
+    # Let the actions finish the events they were handed
+    def close(self):
+        for action in self.actions:
+            action.stop()
+
+# Alarm engine for the rules and actions of an alarm file, on channels named channelNames sampled every
+# sampleInterval seconds
+def loadAlarms(fileName, channelNames, sampleInterval):
+    with open(fileName) as alarmFile:
+        settings = json.load(alarmFile)
+
+    channelNames = [str(name) for name in channelNames]
+    rules = []
+    for rule in settings['rules']:
+        if rule['type'] not in RULE_TYPES:
+            raise ValueError(f'Unknown alarm rule {rule["type"]}, expected one of {tuple(RULE_TYPES)}.')
+        missing = [name for name in rule.get('channels', []) if str(name) not in channelNames]
+        if missing:
+            raise ValueError(f'Alarm rule {rule["type"]} names unknown channels {missing}.')
+        if rule['type'] == 'rate':
+            rules.append(RateRule(rule, channelNames, sampleInterval))
+        else:
+            rules.append(RULE_TYPES[rule['type']](rule, channelNames))
+
+    actions = []
+    for action in settings.get('actions', [{'type': 'log'}]):
+        if action['type'] not in ACTION_TYPES:
+            raise ValueError(f'Unknown alarm action {action["type"]}, expected one of {tuple(ACTION_TYPES)}.')
+        actions.append(ACTION_TYPES[action['type']](action))
+
+    return AlarmEngine(rules, actions)
@@ -0,0 +1,218 @@
+# Statistics and downsampled overviews of whole recordings, computed one chunk at a time so memory use
+# does not grow with the length of a recording. The partial results of chunks are merged, so the chunks
+# of one or many recordings can be analyzed in any order by several processes
+import logging
+import contextlib
+import multiprocessing
+import numpy as np
+from recording import recordingColumns, recordingChunks, readChunk, BOOKKEEPING_COLUMNS
+from segments import isSegmented, segmentFiles
+
+# Sums over the rows of a recording that the statistics of every column and the correlation of every
+# pair of columns are derived from. Values are shifted by a reference value per column and times by
+# timeShift before summing, so the sums of squares do not lose the small variations to rounding.
+# NaN readings, such as an open channel, are left out
+class RecordingStatistics:
+
+    def __init__(self, columns, timeShift = 0.0, shift = None):
+        numColumns = len(columns)
+        self.columns = list(columns)
+        self.timeShift = timeShift
+        self.shift = np.zeros(numColumns) if shift is None else np.asarray(shift, dtype = float)
+
+        self.rows = 0
+        self.firstTime = np.inf
+        self.lastTime = -np.inf
+        self.minimum = np.full(numColumns, np.nan)
+        self.maximum = np.full(numColumns, np.nan)
+
+        # Per column sums over its finite values, for the mean, spread and the drift fit against time
+        self.count = np.zeros(numColumns)
+        self.sum = np.zeros(numColumns)
+        self.sumSquares = np.zeros(numColumns)
+        self.sumTime = np.zeros(numColumns)
+        self.sumTimeSquares = np.zeros(numColumns)
+        self.sumTimeValue = np.zeros(numColumns)
+
+        # Per pair sums over the rows where both values are finite, [i, j] sums column i
+        self.pairCount = np.zeros((numColumns, numColumns))
+        self.pairSum = np.zeros((numColumns, numColumns))
+        self.pairSumSquares = np.zeros((numColumns, numColumns))
+        self.pairProduct = np.zeros((numColumns, numColumns))
+
+    # Add the (rows, columns) values measured at times
+    def add(self, times, values):
+        if len(times) == 0:
+            return
+
+        # Infinite values, such as a shorted channel, count as missing like NaN
+        finite = np.isfinite(values)
+        values = np.where(finite, values, np.nan)
+        weights = finite.astype(float)
+        shifted = np.where(finite, values - self.shift, 0.0)
+        squares = shifted * shifted
+        t = times - self.timeShift
+
+        self.rows += len(times)
+        self.firstTime = min(self.firstTime, times[0])
+        self.lastTime = max(self.lastTime, times[-1])
+        self.minimum = np.fmin(self.minimum, np.fmin.reduce(values, axis = 0))
+        self.maximum = np.fmax(self.maximum, np.fmax.reduce(values, axis = 0))
+
+        self.count += weights.sum(axis = 0)
+        self.sum += shifted.sum(axis = 0)
+        self.sumSquares += squares.sum(axis = 0)
+        self.sumTime += t @ weights
+        self.sumTimeSquares += (t * t) @ weights
+        self.sumTimeValue += t @ shifted
+
+        self.pairCount += weights.T @ weights
+        self.pairSum += shifted.T @ weights
+        self.pairSumSquares += squares.T @ weights
+        self.pairProduct += shifted.T @ shifted
+
+    # Add the sums of other, which has the same columns and shifts
+    def merge(self, other):
+        self.rows += other.rows
+        self.firstTime = min(self.firstTime, other.firstTime)
+        self.lastTime = max(self.lastTime, other.lastTime)
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+
+        for name in ('count', 'sum', 'sumSquares', 'sumTime', 'sumTimeSquares', 'sumTimeValue',
+                     'pairCount', 'pairSum', 'pairSumSquares', 'pairProduct'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    # Count, mean, standard deviation, min, max and the drift per hour of the least squares line
+    # through the values of every column
+    def summary(self):
+        n = self.count
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            mean = self.sum / n
+            std = np.sqrt(np.maximum(self.sumSquares - self.sum * mean, 0) / (n - 1))
+            drift = (n * self.sumTimeValue - self.sumTime * self.sum) / (n * self.sumTimeSquares - self.sumTime ** 2) * 3600
+
+        return {column: {
+            'count': int(n[index]),
+            'mean': mean[index] + self.shift[index],
+            'std': std[index],
+            'min': self.minimum[index],
+            'max': self.maximum[index],
+            'drift (/h)': drift[index],
+        } for index, column in enumerate(self.columns)}
+
+    # (columns, columns) Pearson correlation of every pair of columns over the rows where both are finite
+    def correlation(self):
+        n = self.pairCount
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            covariance = self.pairProduct - self.pairSum * self.pairSum.T / n
+            variance = self.pairSumSquares - self.pairSum ** 2 / n
+            return covariance / np.sqrt(variance * variance.T)
+
+# Min, max and mean of every column in numBins equal time bins from startTime to endTime, enough to
+# draw the whole recording with its full range however long it is. Bins without data are NaN
+class Decimation:
+
+    def __init__(self, numColumns, startTime, endTime, numBins = 2000):
+        self.startTime = startTime
+        self.binWidth = max(endTime - startTime, 1e-9) / numBins
+        self.minimum = np.full((numBins, numColumns), np.nan)
+        self.maximum = np.full((numBins, numColumns), np.nan)
+        self.total = np.zeros((numBins, numColumns))
+        self.count = np.zeros((numBins, numColumns))
+
+    def add(self, times, values):
+        if len(times) == 0:
+            return
+
+        bins = np.clip(((times - self.startTime) / self.binWidth).astype(int), 0, len(self.total) - 1)
+        finite = np.isfinite(values)
+        values = np.where(finite, values, np.nan)
+
+        # Rows are reduced per run of rows in the same bin, times only go backwards if the clock was reset
+        if np.any(bins[1:] < bins[:-1]):
+            order = np.argsort(bins, kind = 'stable')
+            bins, finite, values = bins[order], finite[order], values[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+        index = bins[starts]
+
+        self.minimum[index] = np.fmin(self.minimum[index], np.fmin.reduceat(values, starts, axis = 0))
+        self.maximum[index] = np.fmax(self.maximum[index], np.fmax.reduceat(values, starts, axis = 0))
+        self.total[index] += np.add.reduceat(np.where(finite, values, 0.0), starts, axis = 0)
+        self.count[index] += np.add.reduceat(finite, starts, axis = 0)
+
+    def merge(self, other):
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        self.total += other.total
+        self.count += other.count
+        return self
+
+    # Bin center times and the (bins, columns) means
+    def times(self):
+        return self.startTime + (np.arange(len(self.total)) + 0.5) * self.binWidth
+
+    def mean(self):
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.total / self.count
+
+# Statistics and decimation of one chunk of a recording, run in the worker processes
+def analyzeChunk(task):
+    fileName, chunk, columns, timeShift, shift, timeRange, numBins = task
+    rows = readChunk(fileName, chunk, columns)
+    times, values = rows[:, 0], rows[:, 1:]
+
+    statistics = RecordingStatistics(columns[1:], timeShift, shift)
+    statistics.add(times, values)
+    decimation = Decimation(len(columns) - 1, *timeRange, numBins)
+    decimation.add(times, values)
+    return statistics, decimation
+
+# (file, chunk) pairs of a recording, or of all segments of a segmented recording, and the reference
+# values its statistics are shifted by: the first time and the first finite value of every column. Only
+# the first and the last chunk are read
+def planRecording(fileName, columns, chunkRows):
+    files = segmentFiles(fileName) if isSegmented(fileName) else [fileName]
+    chunks = [(file, chunk) for file in files for chunk in recordingChunks(file, chunkRows)]
+    if not chunks:
+        raise ValueError(f'{fileName} has no rows.')
+
+    first = readChunk(*chunks[0], columns)
+    last = first if len(chunks) == 1 else readChunk(*chunks[-1], columns)
+
+    finite = np.isfinite(first[:, 1:])
+    shift = np.where(finite.any(axis = 0), first[finite.argmax(axis = 0), np.arange(finite.shape[1]) + 1], 0.0)
+    return chunks, first[0, 0], shift, (first[0, 0], last[-1, 0])
+
+# Statistics and decimation of every recording, segmented or not, columns default to every measured
+# column. The chunks of all recordings are shared among processes worker processes. Returns one
+# (columns, statistics, decimation) per recording
+def analyzeRecordings(fileNames, columns = None, chunkRows = 100000, numBins = 2000, processes = 1):
+    tasks = []
+    owners = []
+    plans = []
+    for owner, fileName in enumerate(fileNames):
+        names = recordingColumns(segmentFiles(fileName)[0] if isSegmented(fileName) else fileName)
+        fileColumns = columns or [name for name in names[1:] if name not in BOOKKEEPING_COLUMNS]
+        missing = [name for name in fileColumns if name not in names]
+        if missing:
+            raise ValueError(f'{fileName} has no columns {missing}.')
+
+        # Time first, as readChunk() returns it
+        fileColumns = [names[0]] + [name for name in fileColumns if name != names[0]]
+        chunks, timeShift, shift, timeRange = planRecording(fileName, fileColumns, chunkRows)
+        logging.info(f'{fileName}: {len(chunks)} chunks of {len(fileColumns) - 1} columns.')
+
+        plans.append((fileColumns, RecordingStatistics(fileColumns[1:], timeShift, shift), Decimation(len(fileColumns) - 1, *timeRange, numBins)))
+        tasks += [(file, chunk, fileColumns, timeShift, shift, timeRange, numBins) for file, chunk in chunks]
+        owners += [owner] * len(chunks)
+
+    # Results come back in task order, each is merged into the recording it belongs to
+    with multiprocessing.Pool(processes) if processes > 1 else contextlib.nullcontext() as pool:
+        results = pool.imap(analyzeChunk, tasks) if pool else map(analyzeChunk, tasks)
+        for owner, (statistics, decimation) in zip(owners, results):
+            plans[owner][1].merge(statistics)
+            plans[owner][2].merge(decimation)
+
+    return plans
@@ -0,0 +1,78 @@
+# Script used to analyze whole recordings of any length after a run: per column mean, standard deviation,
+# min, max and drift, the correlation between columns and a plot of the whole run with the min/max band
+# of every column. Recordings are read in chunks, so memory use does not depend on their length, and
+# the chunks can be shared among several processes
+import os
+import json
+import argparse
+import logging
+import numpy as np
+from analysis import analyzeRecordings
+
+CHANNELS_PER_AXIS = 8
+
+# Mean of every bin with the band between its min and max, up to CHANNELS_PER_AXIS columns per axis
+def plotOverview(fileName, imageName, columns, decimation):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    groups = [range(start, min(start + CHANNELS_PER_AXIS, len(columns))) for start in range(0, len(columns), CHANNELS_PER_AXIS)]
+    fig, axes = plt.subplots(len(groups), 1, sharex = True, squeeze = False, figsize = (14, 3.5 * len(groups)))
+
+    times, mean = decimation.times(), decimation.mean()
+    for ax, group in zip(axes[:, 0], groups):
+        for index in group:
+            line, = ax.plot(times, mean[:, index], linewidth = 1, label = columns[index])
+            ax.fill_between(times, decimation.minimum[:, index], decimation.maximum[:, index], color = line.get_color(), alpha = 0.3, linewidth = 0)
+        ax.legend(loc = 'upper left', fontsize = 'small', ncol = 2)
+    axes[0, 0].set_title(f'{fileName}, mean and min/max of {len(times)} bins')
+    axes[-1, 0].set_xlabel('time (s)')
+
+    fig.tight_layout()
+    fig.savefig(imageName)
+    plt.close(fig)
+
+# Worker processes import this script again, only the main process runs it
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description = 'Thermistor Recording Analysis')
+    parser.add_argument('file_names',               help = 'CSV, binary or segmented recordings to analyze.', nargs = '+')
+    parser.add_argument('-c', '--columns',          help = 'Names of the columns to analyze, defaults to every measured column.', nargs = '+')
+    parser.add_argument('-o', '--output_dir',       help = 'Directory to write <recording name>-stats.json and <recording name>-overview.png into.', default = '.')
+    parser.add_argument('-j', '--processes',        help = 'Number of processes sharing the chunks of all recordings.', type = int, default = 1)
+    parser.add_argument('--chunk_rows',             help = 'Number of rows read at a time, memory use grows with it.', type = int, default = 100000)
+    parser.add_argument('--bins',                   help = 'Number of time bins the plot of a whole recording is reduced to.', type = int, default = 2000)
+    parser.add_argument('--no_plot',                help = 'Only compute the statistics, without importing matplotlib.', action = 'store_true')
+
+    args = parser.parse_args()
+
+    # Configuring the logger
+    logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+    results = analyzeRecordings(args.file_names, args.columns, args.chunk_rows, args.bins, args.processes)
+
+    os.makedirs(args.output_dir, exist_ok = True)
+    for fileName, (columns, statistics, decimation) in zip(args.file_names, results):
+        summary = statistics.summary()
+        stem = os.path.join(args.output_dir, os.path.basename(fileName))
+
+        logging.info(f'{fileName}: {statistics.rows} rows from {statistics.firstTime:.3f} to {statistics.lastTime:.3f} s.')
+        for column, stats in summary.items():
+            logging.info(f'    {column}: mean {stats["mean"]:.6g}, std {stats["std"]:.3g}, min {stats["min"]:.6g}, max {stats["max"]:.6g}, '
+                         f'drift {stats["drift (/h)"]:.3g} /h, {stats["count"]} values')
+
+        with open(stem + '-stats.json', 'w') as statsFile:
+            json.dump({
+                'file': fileName,
+                'rows': statistics.rows,
+                'start time (s)': statistics.firstTime,
+                'end time (s)': statistics.lastTime,
+                'columns': summary,
+                'correlation': {'columns': columns[1:], 'matrix': np.round(statistics.correlation(), 6).tolist()},
+            }, statsFile, indent = 4, default = float)
+        logging.info(f'Wrote the statistics to {stem}-stats.json.')
+
+        if not args.no_plot:
+            plotOverview(fileName, stem + '-overview.png', columns[1:], decimation)
+            logging.info(f'Wrote the overview plot to {stem}-overview.png.')
@@ -0,0 +1,248 @@
+# Script used to benchmark the data path against simulated devices: conversion throughput, recording
+# throughput, plot frame latency and the whole acquire -> convert -> record step, for a range of channel
+# counts and sample rates. Results are written to a JSON file so runs can be compared over time
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import logging
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+from ringBuffer import RingBuffer
+from recording import openRecorder, RECORDING_FORMATS
+from simulation import SimulatedDevice
+from conversion import converter, coefficientMatrix, TOTAL_COEFFICIENTS
+
+CONVERSION_METHODS = ('exact', 'table')
+BENCHMARKS = ('conversion', 'recording', 'frame', 'pipeline')
+
+# Voltage blocks of numChannels simulated thermistors, blockSize samples each as (samples, channels)
+def voltBlocks(numChannels, rate, blockSize, numBlocks = 4):
+    device = SimulatedDevice('Sim', range(numChannels), seed = 0, realtime = False, default = {'ramp': 0.01})
+    device.configureBuffered(rate, blockSize)
+    device.start()
+    return [device.readBlock().T.copy() for block in range(numBlocks)]
+
+# Call step(index) until duration seconds have passed, at least minCalls times, returning the
+# latency of every call in seconds
+def measure(step, duration, minCalls = 5):
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < minCalls or time.perf_counter() - start < duration:
+        callStart = time.perf_counter()
+        step(len(latencies))
+        latencies.append(time.perf_counter() - callStart)
+    return np.array(latencies)
+
+# Largest amount of memory in bytes allocated at once while calling step(index) numCalls times
+def peakMemory(step, numCalls = 5):
+    tracemalloc.start()
+    try:
+        for index in range(numCalls):
+            step(index)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def latencyStats(latencies):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {'calls': len(latencies), 'p50 (s)': p50, 'p90 (s)': p90, 'p99 (s)': p99, 'max (s)': latencies.max()}
+
+def benchConversion(numChannels, rate, blockSize, method, duration):
+    blocks = voltBlocks(numChannels, rate, blockSize)
+    convert = converter(coefficientMatrix(TOTAL_COEFFICIENTS, numChannels), method)
+    step = lambda index: convert(blocks[index % len(blocks)])
+
+    step(0) # Builds the lookup table outside of the measurement
+    latencies = measure(step, duration)
+    return dict(latencyStats(latencies), **{
+        'samples/s': blockSize * numChannels * len(latencies) / latencies.sum(),
+        'peak memory (B)': peakMemory(step),
+    })
+
+def benchRecording(numChannels, rate, blockSize, fileFormat, duration, directory):
+    blocks = voltBlocks(numChannels, rate, blockSize)
+    temps, res = converter(coefficientMatrix(TOTAL_COEFFICIENTS, numChannels))(blocks[0])
+    fieldNames = ['time (s)'] + [f'temp{i}' for i in range(1, numChannels + 1)] + [f'res{i}' for i in range(1, numChannels + 1)]
+
+    fileName = os.path.join(directory, f'recording.{fileFormat}')
+    recorder = openRecorder(fileName, fieldNames, fileFormat)
+    step = lambda index: recorder.write(np.column_stack(((index * blockSize + np.arange(blockSize)) / rate, temps, res)))
+
+    latencies = measure(step, duration)
+    closeStart = time.perf_counter()
+    recorder.close()
+    elapsed = latencies.sum() + time.perf_counter() - closeStart
+    fileSize = os.path.getsize(fileName)
+
+    recorder = openRecorder(fileName, fieldNames, fileFormat)
+    peak = peakMemory(step)
+    recorder.close()
+
+    return dict(latencyStats(latencies), **{
+        'rows/s': blockSize * len(latencies) / elapsed,
+        'MB/s': fileSize / elapsed / 1e6,
+        'bytes/row': fileSize / (blockSize * len(latencies)),
+        'peak memory (B)': peak,
+    })
+
+# One plot refresh as in the scripts: take the ring buffer window, update the lines and blit them,
+# with one second of new samples arriving between frames
+def benchFrame(numChannels, rate, windowLength, duration):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from plotting import LivePlot, redraw
+
+    samplesPerFrame = max(1, int(rate))
+    blocks = voltBlocks(numChannels, rate, samplesPerFrame)
+    temps = [converter(coefficientMatrix(TOTAL_COEFFICIENTS, numChannels))(block)[0] for block in blocks]
+
+    # 8 thermistors per axis, like the scripts
+    numAxes = int(np.ceil(numChannels / 8))
+    fig, axes = plt.subplots(numAxes, 1, squeeze = False, figsize = (14, 3 * numAxes))
+    livePlot = LivePlot(fig)
+    for index, ax in enumerate(axes[:, 0]):
+        livePlot.addAxis(ax, range(8 * index, min(8 * index + 8, numChannels)), [f'Thermistor {i + 1}' for i in range(8 * index, min(8 * index + 8, numChannels))], marker = 'o', markersize = 2)
+        ax.legend()
+
+    plotBuffer = RingBuffer(numChannels, windowLength)
+    backgrounds = {}
+
+    # Full draws of the canvas, a background is only valid for the limits it was last drawn with
+    draws = [0]
+    def onDraw(event):
+        draws[0] += 1
+    fig.canvas.mpl_connect('draw_event', onDraw)
+    fig.canvas.draw()
+
+    def frame(index):
+        plotBuffer.extend((index * samplesPerFrame + np.arange(samplesPerFrame)) / rate, temps[index % len(temps)])
+        lines = livePlot.update(*plotBuffer.window())
+
+        # New limits need a full redraw before the background can be captured again, as in the scripts
+        redraw(fig, livePlot)
+        views = {ax: (ax.get_xlim(), ax.get_ylim()) for ax in axes[:, 0]}
+
+        for ax, view in views.items():
+            if backgrounds.get(ax, (None,))[0] != view:
+                backgrounds[ax] = (view, fig.canvas.copy_from_bbox(ax.bbox))
+            fig.canvas.restore_region(backgrounds[ax][1])
+        for line in lines:
+            line.axes.draw_artist(line)
+        for ax in axes[:, 0]:
+            fig.canvas.blit(ax.bbox)
+
+    drawsBefore = draws[0]
+    latencies = measure(frame, duration)
+    redraws = draws[0] - drawsBefore
+    peak = peakMemory(frame)
+    plt.close(fig)
+
+    return dict(latencyStats(latencies), **{'frames/s': len(latencies) / latencies.sum(), 'redrawn frames': redraws / len(latencies), 'peak memory (B)': peak})
+
+# Read a block from the simulated devices, convert it, record it and keep it for plotting, as the
+# acquisition thread of the scripts does
+def benchPipeline(numChannels, rate, blockSize, method, fileFormat, duration, directory):
+    device = SimulatedDevice('Sim', range(numChannels), seed = 0, realtime = False)
+    device.configureBuffered(rate, blockSize)
+    device.start()
+
+    convert = converter(coefficientMatrix(TOTAL_COEFFICIENTS, numChannels), method)
+    fieldNames = ['time (s)'] + [f'temp{i}' for i in range(1, numChannels + 1)] + [f'res{i}' for i in range(1, numChannels + 1)]
+    recorder = openRecorder(os.path.join(directory, f'pipeline.{fileFormat}'), fieldNames, fileFormat)
+    plotBuffer = RingBuffer(numChannels, 500)
+
+    def step(index):
+        voltBlock = device.readBlock().T
+        temps, res = convert(voltBlock)
+        times = (index * blockSize + np.arange(blockSize)) / rate
+        recorder.write(np.column_stack((times, temps, res)))
+        plotBuffer.extend(times, temps)
+
+    latencies = measure(step, duration)
+    peak = peakMemory(step)
+    recorder.close()
+
+    return dict(latencyStats(latencies), **{
+        'samples/s': blockSize * numChannels * len(latencies) / latencies.sum(),
+        'real time factor': blockSize / rate / np.median(latencies),
+        'peak memory (B)': peak,
+    })
+
+# Versions and machine the results were measured with
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+
+    try:
+        import matplotlib
+        matplotlibVersion = matplotlib.__version__
+    except ImportError:
+        matplotlibVersion = None
+
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'matplotlib': matplotlibVersion,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(description = 'Thermistor Data Path Benchmarks')
+parser.add_argument('-o', '--output',           help = 'JSON file to write the results into, defaults to benchmark-<UTC time>.json.')
+parser.add_argument('-c', '--channels',         help = 'Channel counts to benchmark.', type = int, nargs = '+', default = [8, 24, 256])
+parser.add_argument('-r', '--rates',            help = 'Sample rates in Hz to benchmark.', type = float, nargs = '+', default = [1, 100, 1000])
+parser.add_argument('-d', '--duration',         help = 'Seconds spent measuring each case.', type = float, default = 1.0)
+parser.add_argument('-w', '--window_length',    help = 'Number of samples shown in the plots of the frame benchmark.', type = int, default = 500)
+parser.add_argument('-b', '--benchmarks',       help = 'Benchmarks to run.', choices = BENCHMARKS, nargs = '+', default = list(BENCHMARKS))
+
+args = parser.parse_args()
+
+# Configuring the logger
+logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+results = []
+
+# Each case reads blocks of 0.1 s of samples, like buffered acquisition in the scripts
+with tempfile.TemporaryDirectory() as directory:
+    for numChannels in args.channels:
+        for rate in args.rates:
+            blockSize = max(1, int(rate / 10))
+            case = {'channels': numChannels, 'rate (Hz)': rate, 'block size': blockSize}
+            caseStart = len(results)
+
+            if 'conversion' in args.benchmarks:
+                for method in CONVERSION_METHODS:
+                    results.append(dict(case, benchmark = 'conversion', backend = method, **benchConversion(numChannels, rate, blockSize, method, args.duration)))
+
+            if 'recording' in args.benchmarks:
+                for fileFormat in RECORDING_FORMATS:
+                    results.append(dict(case, benchmark = 'recording', backend = fileFormat, **benchRecording(numChannels, rate, blockSize, fileFormat, args.duration, directory)))
+
+            if 'frame' in args.benchmarks:
+                results.append(dict(case, benchmark = 'frame', backend = 'blit', **benchFrame(numChannels, rate, args.window_length, args.duration)))
+
+            if 'pipeline' in args.benchmarks:
+                for method in CONVERSION_METHODS:
+                    for fileFormat in RECORDING_FORMATS:
+                        results.append(dict(case, benchmark = 'pipeline', backend = f'{method}/{fileFormat}', **benchPipeline(numChannels, rate, blockSize, method, fileFormat, args.duration, directory)))
+
+            for result in results[caseStart:]:
+                logging.info(f"{result['benchmark']:>10} {result['backend']:>13} {numChannels:>5} channels {rate:>7g} Hz: "
+                             f"p50 {result['p50 (s)'] * 1e3:8.3f} ms, p99 {result['p99 (s)'] * 1e3:8.3f} ms, peak {result['peak memory (B)'] / 1e6:7.2f} MB")
+
+outputName = args.output or time.strftime('benchmark-%Y%m%dT%H%M%SZ.json', time.gmtime())
+with open(outputName, 'w') as outputFile:
+    json.dump({'environment': environment(), 'results': results}, outputFile, indent = 4, default = float)
+logging.info(f'Wrote {len(results)} results to {outputName}.')
@@ -0,0 +1,23 @@
+# Script used to convert a binary recording into the CSV layout written by the data collection scripts
+import os
+import argparse
+import logging
+from recording import exportCsv
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(description = 'Binary Recording to CSV Converter')
+parser.add_argument('file_name',                help = 'Binary recording to convert, its header is read from <file_name>.json.')
+parser.add_argument('-o', '--output',           help = 'Name of the CSV file to write, defaults to the recording name with a .csv extension.')
+parser.add_argument('--chunk_rows',             help = 'Number of rows converted at a time.', type = int, default = 100000)
+
+args = parser.parse_args()
+
+# Configuring the logger
+logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+csvName = args.output or os.path.splitext(args.file_name)[0] + '.csv'
+if os.path.abspath(csvName) == os.path.abspath(args.file_name):
+    parser.error(f'{csvName} would overwrite the recording it is converted from, name another file with --output.')
+logging.info(f'Converting {args.file_name} to {csvName}.')
+numRows = exportCsv(args.file_name, csvName, args.chunk_rows)
+logging.info(f'Wrote {numRows} rows.')
@@ -1,149 +1,60 @@
 # Script to calibrate thermistors
-
-import csv
-import nidaqmx
-import argparse
-import logging 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-
-# Function to calculate temperature in celsius given output voltage
-def resCalc(voltList):
-    resList = []
-
-    voltIn = 5
-    R0 = 10000 # 10k Ohm Resistor used for voltage divider
-
-    # Calculate thermistor resistance
-    for volt in voltList:
-        Rt = (volt * R0) / (voltIn - volt)
-
-        resList.append(Rt)
-
-    return resList
-
-# Animation initialization script
-def init():
-    ax.clear()
-
-# Logging temperature data from DAQ Device and real time plotting
-def animate(frame):
-    voltOutList = task.read()
-    resList = resCalc(voltOutList)
-
-    time = frame * timeInterval
-
-    with open('resData.csv', 'a', newline = '') as csvFile:
-        csvWriter = csv.DictWriter(csvFile, fieldnames = fieldNames)
-        data = {
-            'time (s)': time,
-            'res1 (ohm)': resList[0], 
-            'res2 (ohm)': resList[1],
-            'res3 (ohm)': resList[2],
-            'res4 (ohm)': resList[3],
-            'res5 (ohm)': resList[4],
-            'res6 (ohm)': resList[5],
-            'res7 (ohm)': resList[6],
-            'res8 (ohm)': resList[7]
-        }
-        csvWriter.writerow(data)
-        logging.info(f'time: {time} \n'
-        f'          res1, {round(resList[0], 3)}; res2, {round(resList[1], 3)}; res3, {round(resList[2], 3)}; res4, {round(resList[3], 3)} \n'
-        f'          res5, {round(resList[4], 3)}; res6, {round(resList[5], 3)}; res7, {round(resList[6], 3)}; res8, {round(resList[7], 3)}')
-
-    data = pd.read_csv('resData.csv')
-    t = data['time (s)']
-    res1 = np.array(data['res1 (ohm)']) 
-    res2 = np.array(data['res2 (ohm)']) + 2
-    res3 = np.array(data['res3 (ohm)']) + 4
-    res4 = np.array(data['res4 (ohm)']) + 6
-    res5 = np.array(data['res5 (ohm)']) + 8
-    res6 = np.array(data['res6 (ohm)']) + 10
-    res7 = np.array(data['res7 (ohm)']) + 12
-    res8 = np.array(data['res8 (ohm)']) + 14
-    
-
-    t = t[-50:]
-    res1 = res1[-50:]
-    res2 = res2[-50:]
-    res3 = res3[-50:]
-    res4 = res4[-50:]
-    res5 = res5[-50:]
-    res6 = res6[-50:]
-    res7 = res7[-50:]
-    res8 = res8[-50:]
-
-    ax.clear()
-    ax.plot(t, res1, marker = 'o', label = 'Thermistor 1', markersize = 3)
-    ax.plot(t, res2, marker = 'o', label = 'Thermistor 2', markersize = 3)
-    ax.plot(t, res3, marker = 'o', label = 'Thermistor 3', markersize = 3)
-    ax.plot(t, res4, marker = 'o', label = 'Thermistor 4', markersize = 3)
-    ax.plot(t, res5, marker = 'o', label = 'Thermistor 5', markersize = 3)
-    ax.plot(t, res6, marker = 'o', label = 'Thermistor 6', markersize = 3)
-    ax.plot(t, res7, marker = 'o', label = 'Thermistor 7', markersize = 3)
-    ax.plot(t, res8, marker = 'o', label = 'Thermistor 8', markersize = 3)
-    ax.legend()
-    ax.set_title('Resistance Graph')
-    ax.set_xlabel('time (s)')
-    ax.set_ylabel('resistance (ohm)')
-    ax.grid()
-
-
-# Parse command line arguments
-parser = argparse.ArgumentParser(description = 'Thermistor Resistance Data Collection')
-parser.add_argument('-t', '--time_interval',      help = 'Interval between each data collection, in seconds.')
-parser.add_argument('-f', '--final_time',         help = 'Final data collection time.')
-
-args = parser.parse_args()
-
-# Configuring the logger
-logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO) 
-
-# Assign start time and time interval for recording, both in seconds
-timeInterval = float(args.time_interval)
-aniInterval = int(timeInterval * 1000)
-
-if not args.final_time:
-    repeatBool = True
-    numFrames = None
-    logging.info('No final time specified, data collection will continue indefinitely.')
-else:    
-    finalTime = float(args.final_time)
-    numFrames = int((finalTime / timeInterval) + 1)
-    repeatBool = False
-
-# Initialize the nidaqmx task
-logging.info('Initializing nidaqmx task.')
-task = nidaqmx.Task()
-RSE = nidaqmx.constants.TerminalConfiguration(10083) # Referenced Single-Ended
-task.ai_channels.add_ai_voltage_chan('Dev1/ai0', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai1', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai2', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai3', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai4', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai5', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai6', terminal_config = RSE, min_val = 0, max_val = 5)
-task.ai_channels.add_ai_voltage_chan('Dev1/ai7', terminal_config = RSE, min_val = 0, max_val = 5)
-task.start()
-
-# Open file for data recording
-logging.info('Opening file resData.csv for data collection.')
-fieldNames = ['time (s)', 'res1 (ohm)', 'res2 (ohm)', 'res3 (ohm)', 'res4 (ohm)', 'res5 (ohm)', 'res6 (ohm)', 'res7 (ohm)', 'res8 (ohm)']
-with open('resData.csv', 'w') as csvFile:
-    csvWriter = csv.DictWriter(csvFile, fieldnames = fieldNames)
-    csvWriter.writeheader()
-
-# Initialize plotting figure
-fig = plt.figure(figsize = (14, 7))
-ax = fig.add_subplot(111)
-
-# Start data collection and animation
-logging.info('Starting data collection and plotting animation.')
-ani = FuncAnimation(fig, animate, init_func = init, interval = aniInterval, frames = numFrames, repeat = repeatBool)
-plt.show()
-
-# Stop and close task
-task.stop()
-task.close()
\ No newline at end of file
+from plotting import LivePlot
+from channelMap import CALIBRATION_CHANNEL_MAP
+from conversion import resistance
+from dataCollection import DataCollection
+
+class Calibration(DataCollection):
+
+    description = 'Thermistor Resistance Data Collection'
+    channelMapFile = CALIBRATION_CHANNEL_MAP
+
+    def addArguments(self, parser):
+        parser.add_argument('-f', '--final_time',       help = 'Final data collection time.')
+        parser.add_argument('-n', '--file_name',        help = 'Name of file to record data into, defaults to resData.csv or resData.bin.')
+
+    def defaultFileName(self):
+        return 'resData.bin' if self.args.format == 'binary' else 'resData.csv'
+
+    def columns(self):
+        return [f'res{thermistor} (ohm)' for thermistor in self.channelMap.thermistors]
+
+    def readingNames(self):
+        return [f'res{thermistor}' for thermistor in self.channelMap.thermistors]
+
+    def convert(self, voltBlock):
+        resBlock = resistance(voltBlock)
+        return resBlock, resBlock
+
+    # One panel of resistances per plot group of the channel map, the recent samples above the whole run
+    def buildFigure(self, plt):
+        channelMap = self.channelMap
+        numPlots = len(channelMap.plots)
+        fig = plt.figure(figsize = (14, 5.5 * (numPlots + 1)))
+        historyAx = fig.add_subplot(numPlots + 1, 1, numPlots + 1)
+
+        # Offset each thermistor so the curves do not overlap
+        livePlot = LivePlot(fig)
+        for index, (title, channels) in enumerate(channelMap.plots):
+            ax = fig.add_subplot(numPlots + 1, 1, index + 1)
+            livePlot.addAxis(ax, channels, [f'Thermistor {channelMap.thermistors[channel]}' for channel in channels],
+                             offsets = 2 * np.arange(len(channels)), marker = 'o', markersize = 3)
+            ax.legend()
+            ax.set_title(f'Resistance Graph, {title}' if numPlots > 1 else 'Resistance Graph')
+            ax.set_xlabel('time (s)')
+            ax.set_ylabel('resistance (ohm)')
+            ax.grid()
+
+        historyPlot = LivePlot(fig)
+        historyPlot.addAxis(historyAx, range(channelMap.numChannels), [f'Thermistor {thermistor}' for thermistor in channelMap.thermistors],
+                            offsets = 2 * np.arange(channelMap.numChannels), linewidth = 1)
+        historyAx.set_title('Whole Run, min/max envelope')
+        historyAx.set_xlabel('time (s)')
+        historyAx.set_ylabel('resistance (ohm)')
+        historyAx.grid()
+
+        return fig, livePlot, historyPlot
+
+if __name__ == '__main__':
+    Calibration().run()
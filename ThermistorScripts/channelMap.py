@@ -0,0 +1,131 @@
+# Channel map describing which thermistor is wired to which device channel, the coefficients each
+# thermistor is converted with and how they are grouped in the plots, read from a JSON file:
+#
+#   {
+#       "version": 1,
+#       "coefficientFile": "coefficients.json",
+#       "coefficientSets": {"batch": [1.262740397e-3, 1.968014123e-4, 3.483432557e-7]},
+#       "defaultCoefficients": "batch",
+#       "devices": [
+#           {"name": "Dev1", "label": "Black", "channels": [0, 1, 2, 3, 4, 5, 6, 7]},
+#           {"name": "Dev2", "channels": [{"ai": 0, "thermistor": "T17", "coefficients": "T17"}, 1, 2]}
+#       ],
+#       "plots": [{"title": "Inner ring", "thermistors": ["1", "2", "T17"]}]
+#   }
+#
+# A channel is either its ai number or a dict with its "ai" number, "thermistor" ID and "coefficients".
+# Thermistors without an ID are numbered 1, 2, 3, ... in map order. "coefficients" names a set in
+# "coefficientSets" or a thermistor in the coefficient file (a path relative to the map), defaulting to
+# the thermistor's own entry in the coefficient file if it has one, otherwise to "defaultCoefficients".
+# The "batch" set is the batch fit of the coefficient file, or the built in batch calibration.
+# Without "plots" every device gets one plot panel
+import os
+import json
+import numpy as np
+from daq import openDevice
+from conversion import loadCoefficients, TOTAL_COEFFICIENTS, BATCH_ID
+
+CHANNEL_MAP_VERSION = 1
+
+# Default map next to the scripts, the three 8 channel devices of the temperature setup
+DEFAULT_CHANNEL_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'channelMap.json')
+
+# Default map of calTest.py and calibration.py, the 8 thermistors being calibrated on Dev1
+CALIBRATION_CHANNEL_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibrationMap.json')
+
+class ChannelMap:
+
+    def __init__(self, devices, coefficientSets = None, defaultCoefficients = BATCH_ID, coefficientFile = None, plots = None):
+        self.coefficientSets = dict(coefficientSets or {})
+
+        # Flatten the devices into one list of channels, in the order their columns are recorded
+        self.devices = []
+        self.thermistors = []
+        coefficientNames = []
+        for device in devices:
+            channels = []
+            for channel in device['channels']:
+                if not isinstance(channel, dict):
+                    channel = {'ai': channel}
+
+                thermistor = str(channel.get('thermistor', len(self.thermistors) + 1))
+                if thermistor in self.thermistors:
+                    raise ValueError(f'Thermistor {thermistor} is on more than one channel.')
+
+                channels.append(channel['ai'])
+                self.thermistors.append(thermistor)
+                coefficientNames.append(channel.get('coefficients'))
+
+            self.devices.append({
+                'name': device['name'],
+                'label': device.get('label', device['name']),
+                'channels': channels,
+                'minVal': device.get('minVal', 0),
+                'maxVal': device.get('maxVal', 5),
+            })
+
+        self.numChannels = len(self.thermistors)
+        self.coefficients = self._coefficients(coefficientNames, defaultCoefficients, coefficientFile)
+
+        # Plot panels as (title, channel indices)
+        if plots is None:
+            plots = []
+            first = 0
+            for device in self.devices:
+                thermistors = self.thermistors[first:first + len(device['channels'])]
+                plots.append({'title': f'{device["label"]}: thermistors {thermistors[0]} - {thermistors[-1]}', 'thermistors': thermistors})
+                first += len(device['channels'])
+
+        self.plots = []
+        for plot in plots:
+            missing = [thermistor for thermistor in plot['thermistors'] if thermistor not in self.thermistors]
+            if missing:
+                raise ValueError(f'Plot {plot["title"]} shows thermistors {missing} that are not on any channel.')
+            self.plots.append((plot['title'], [self.thermistors.index(thermistor) for thermistor in plot['thermistors']]))
+
+    # Record columns: time, then the temperature and the resistance of every thermistor, then extra
+    def fieldNames(self, extra = ()):
+        return (['time (s)'] + [f'temp{thermistor}' for thermistor in self.thermistors]
+                + [f'res{thermistor}' for thermistor in self.thermistors] + list(extra))
+
+    # One device per entry of the map, real or simulated (see daq.openDevice)
+    def openDevices(self, simulation = None):
+        return [openDevice(device['name'], device['channels'], simulation, device['minVal'], device['maxVal']) for device in self.devices]
+
+    # (channels, 3) coefficient matrix in channel order
+    def _coefficients(self, names, default, coefficientFile):
+        fileThermistors = {}
+        if coefficientFile:
+            with open(coefficientFile) as fileContent:
+                fileThermistors = json.load(fileContent)['thermistors']
+
+        # The batch calibration is built in, unless the coefficient file has its own batch fit
+        if BATCH_ID not in self.coefficientSets and BATCH_ID not in fileThermistors:
+            self.coefficientSets[BATCH_ID] = TOTAL_COEFFICIENTS.tolist()
+
+        resolved = [name if name is not None else thermistor if thermistor in fileThermistors else default
+                    for thermistor, name in zip(self.thermistors, names)]
+
+        unknown = [name for name in resolved if name not in self.coefficientSets and name not in fileThermistors]
+        if unknown:
+            raise ValueError(f'No coefficient sets or coefficient file entries called {sorted(set(unknown))}.')
+
+        fromFile = sorted({name for name in resolved if name not in self.coefficientSets})
+        fileCoefficients = dict(zip(fromFile, loadCoefficients(coefficientFile, fromFile))) if fromFile else {}
+
+        coefficients = np.array([self.coefficientSets[name] if name in self.coefficientSets else fileCoefficients[name] for name in resolved], dtype = float)
+        return coefficients
+
+# Channel map from a JSON file, coefficientFile overrides the coefficient file named in the map
+def loadChannelMap(fileName = DEFAULT_CHANNEL_MAP, coefficientFile = None):
+    with open(fileName) as mapFile:
+        config = json.load(mapFile)
+
+    if config.get('version', CHANNEL_MAP_VERSION) > CHANNEL_MAP_VERSION:
+        raise ValueError(f'{fileName} is a version {config["version"]} channel map, newer than the supported version {CHANNEL_MAP_VERSION}.')
+
+    # Paths in the map are relative to the map itself
+    if coefficientFile is None and config.get('coefficientFile'):
+        coefficientFile = os.path.join(os.path.dirname(os.path.abspath(fileName)), config['coefficientFile'])
+
+    return ChannelMap(config['devices'], config.get('coefficientSets'), config.get('defaultCoefficients', BATCH_ID), coefficientFile, config.get('plots'))
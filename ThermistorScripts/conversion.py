@@ -0,0 +1,226 @@
+# Voltage divider and Steinhart-Hart conversion shared by all thermistor scripts
+import json
+import time
+import numpy as np
+
+VOLT_IN = 5 # Supply voltage across the voltage divider
+R0 = 10000 # 10k Ohm Resistor used for voltage divider
+
+# Steinhart-Hart Equation Coefficients (a, b, c) fitted to the whole batch of thermistors
+TOTAL_COEFFICIENTS = np.array([1.262740397e-3, 1.968014123e-4, 3.483432557e-7])
+
+# Steinhart-Hart Equation Coefficients (a, b, c) of each individually calibrated thermistor 1 - 8
+INDIVIDUAL_COEFFICIENTS = np.array([
+    [1.205128477e-3, 2.094565574e-4, 2.741892606e-7],
+    [1.406532446e-3, 1.754768206e-4, 4.163535932e-7],
+    [1.330672717e-3, 1.836781719e-4, 4.147272317e-7],
+    [1.180427397e-3, 2.073609455e-4, 3.274716749e-7],
+    [1.149354211e-3, 2.181719930e-4, 2.444470918e-7],
+    [1.430276584e-3, 1.709819755e-4, 4.385882308e-7],
+    [1.309786804e-3, 1.865957075e-4, 4.072690163e-7],
+    [1.139845262e-3, 2.144059319e-4, 2.970712604e-7]
+])
+
+# Version of the coefficient files written by fitCoefficients.py
+COEFFICIENT_FILE_VERSION = 1
+
+# Thermistor ID of the set fitted to every thermistor of a calibration together
+BATCH_ID = 'batch'
+
+# Write fitted coefficients into a coefficient file, fits maps each thermistor ID to a dict with its
+# 'coefficients' (a, b, c) and any fit statistics to keep with them
+def saveCoefficients(fileName, fits, sources = ()):
+    content = {
+        'version': COEFFICIENT_FILE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sources': list(sources),
+        'thermistors': fits,
+    }
+    with open(fileName, 'w') as coefficientFile:
+        json.dump(content, coefficientFile, indent = 4, default = float)
+
+# (len(thermistors), 3) matrix with the coefficients of each thermistor ID from a coefficient file
+def loadCoefficients(fileName, thermistors):
+    with open(fileName) as coefficientFile:
+        content = json.load(coefficientFile)
+
+    if content['version'] > COEFFICIENT_FILE_VERSION:
+        raise ValueError(f'{fileName} is a version {content["version"]} coefficient file, newer than the supported version {COEFFICIENT_FILE_VERSION}.')
+
+    missing = [thermistor for thermistor in thermistors if thermistor not in content['thermistors']]
+    if missing:
+        raise ValueError(f'{fileName} has no coefficients for thermistors {missing}.')
+
+    return np.array([content['thermistors'][thermistor]['coefficients'] for thermistor in thermistors], dtype = float)
+
+# Function to calculate thermistor resistance given divider output voltage, for any array of voltages.
+# R0 and voltIn are scalars or one value per channel. An open channel reads voltIn or more and a shorted
+# one 0 or less, neither has a resistance and both come out as NaN
+def resistance(volts, R0 = R0, voltIn = VOLT_IN):
+    volts = np.asarray(volts, dtype = float)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        res = (volts * R0) / (voltIn - volts)
+    return np.where((volts > 0) & (volts < voltIn), res, np.nan)
+
+# Function to calculate temperature in Celsius given thermistor resistance, coefficients is either
+# one (a, b, c) set shared by every channel or a (channels, 3) matrix with one set per channel.
+# Resistances that are not positive and finite, such as those of open or shorted channels, give NaN
+def steinhartHart(res, coefficients):
+    coefficients = np.asarray(coefficients, dtype = float)
+    a = coefficients[..., 0]
+    b = coefficients[..., 1]
+    c = coefficients[..., 2]
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        logRes = np.log(res)
+        temps = 1 / (a + b * logRes + c * logRes * logRes * logRes) - 273.15
+    return np.where(np.isfinite(logRes), temps, np.nan)
+
+# Inverse of steinhartHart, resistance of a thermistor at a temperature in Celsius. Solves the cubic
+# c * x^3 + b * x + (a - 1 / T) = 0 for x = ln(R) in closed form, it has exactly one real root
+def inverseSteinhartHart(temps, coefficients):
+    coefficients = np.asarray(coefficients, dtype = float)
+    a = coefficients[..., 0]
+    b = coefficients[..., 1]
+    c = coefficients[..., 2]
+
+    p = b / c
+    q = (a - 1 / (np.asarray(temps, dtype = float) + 273.15)) / c
+    root = np.sqrt(q * q / 4 + p * p * p / 27)
+    return np.exp(np.cbrt(-q / 2 + root) + np.cbrt(-q / 2 - root))
+
+# Inverse of resistance, divider output voltage for a thermistor resistance
+def dividerVoltage(res, R0 = R0, voltIn = VOLT_IN):
+    res = np.asarray(res, dtype = float)
+    return voltIn * res / (R0 + res)
+
+# Convert a (samples, channels) array of voltages to temperature and resistance in one batched pass
+def convert(volts, coefficients, R0 = R0, voltIn = VOLT_IN):
+    res = resistance(volts, R0, voltIn)
+    return steinhartHart(res, coefficients), res
+
+# Repeat a single coefficient set into a (channels, 3) matrix
+def coefficientMatrix(coefficients, numChannels):
+    return np.tile(np.asarray(coefficients, dtype = float), (numChannels, 1))
+
+# Dense voltage to temperature table for one or more coefficient sets, converting with vectorized
+# linear interpolation instead of evaluating log and a cube per sample per channel. Coefficients are
+# one (a, b, c) set shared by every channel or one set per channel, channels with identical sets share
+# a table. Voltages outside voltRange, (1% - 99% of voltIn) by default, fall back to the exact equation
+class LookupTable:
+
+    def __init__(self, coefficients, R0 = R0, voltIn = VOLT_IN, numPoints = 4096, voltRange = None):
+        coefficients = np.atleast_2d(np.asarray(coefficients, dtype = float))
+        numChannels = len(coefficients)
+
+        if voltRange is None:
+            voltRange = (0.01 * np.asarray(voltIn, dtype = float), 0.99 * np.asarray(voltIn, dtype = float))
+
+        # Every distinct combination of coefficients, divider and voltage range gets one table
+        params = np.column_stack([coefficients] + [np.broadcast_to(np.asarray(value, dtype = float), (numChannels,))
+                                                   for value in (R0, voltIn, voltRange[0], voltRange[1])])
+        params, channelSet = np.unique(params, axis = 0, return_inverse = True)
+        self.channelSet = channelSet.ravel()
+
+        self.coefficients = params[:, 0:3]
+        self.R0 = params[:, 3]
+        self.voltIn = params[:, 4]
+        self.voltMin = params[:, 5]
+        self.voltMax = params[:, 6]
+        self.numPoints = numPoints
+        self.step = (self.voltMax - self.voltMin) / (numPoints - 1)
+
+        # One row of temperatures per table on an evenly spaced voltage grid, stored flat with the
+        # slope to the next point so interpolating is a single multiply add
+        numSets = len(params)
+        grid = self.voltMin[:, np.newaxis] + self.step[:, np.newaxis] * np.arange(numPoints)
+        self.table = self._exact(grid, np.arange(numSets)[:, np.newaxis])
+        self.flatTable = self.table.ravel()
+        self.flatSlope = np.diff(self.table, axis = 1, append = 0).ravel()
+
+        self.invStep = 1 / self.step
+        self.offset = self.voltMin * self.invStep
+        self.setStart = np.arange(numSets) * numPoints
+
+        self._maxError = None
+
+    # Convert a (samples, channels) array of voltages, channels must match the number of
+    # coefficient sets unless a single set is shared by every channel
+    def convert(self, volts):
+        shape = np.shape(volts)
+        volts = np.atleast_1d(np.asarray(volts, dtype = float))
+        setIndex = self.channelSet if len(self.channelSet) > 1 else 0
+
+        temps = self._interpolate(volts, setIndex)
+        res = resistance(volts, self.R0[setIndex], self.voltIn[setIndex])
+        return temps.reshape(shape), res.reshape(shape)
+
+    # Largest difference in Celsius between interpolated and exact temperature for each coefficient set,
+    # checked at checkPoints evenly spaced voltages inside every table interval
+    def maxError(self, checkPoints = 16):
+        if self._maxError is None:
+            offsets = np.arange(1, checkPoints + 1) / (checkPoints + 1)
+            positions = (np.arange(self.numPoints - 1)[:, np.newaxis] + offsets).ravel()
+
+            setIndex = np.arange(len(self.coefficients))
+            volts = self.voltMin + self.step * positions[:, np.newaxis]
+            error = np.abs(self._interpolate(volts, setIndex) - self._exact(volts, setIndex))
+
+            self._maxError = np.nanmax(error, axis = 0)[self.channelSet]
+
+        return self._maxError
+
+    def _interpolate(self, volts, setIndex):
+
+        # Position on the voltage grid, split into table index and fraction in place to avoid temporaries
+        position = volts * self.invStep[setIndex]
+        position -= self.offset[setIndex]
+        inRange = position.min() >= 0 and position.max() <= self.numPoints - 1 # False if any NaN
+
+        with np.errstate(invalid = 'ignore'):
+            index = position.astype(np.intp)
+        np.clip(index, 0, self.numPoints - 2, out = index)
+        position -= index
+        index += self.setStart[setIndex]
+
+        temps = np.take(self.flatTable, index)
+        change = np.take(self.flatSlope, index)
+        change *= position
+        temps += change
+
+        if not inRange:
+            outside = ~((volts >= self.voltMin[setIndex]) & (volts <= self.voltMax[setIndex]))
+            temps[outside] = self._exact(volts[outside], np.broadcast_to(setIndex, volts.shape)[outside])
+
+        return temps
+
+    def _exact(self, volts, setIndex):
+        res = resistance(volts, self.R0[setIndex], self.voltIn[setIndex])
+        return steinhartHart(res, self.coefficients[setIndex])
+
+_lookupTables = {}
+
+# Cached lookup table, tables are only built once per coefficient set, R0, voltIn and density
+def lookupTable(coefficients, R0 = R0, voltIn = VOLT_IN, numPoints = 4096, voltRange = None):
+    coefficients = np.atleast_2d(np.asarray(coefficients, dtype = float))
+    key = (coefficients.tobytes(), coefficients.shape, np.asarray(R0, dtype = float).tobytes(),
+           np.asarray(voltIn, dtype = float).tobytes(), numPoints, None if voltRange is None else tuple(voltRange))
+
+    if key not in _lookupTables:
+        _lookupTables[key] = LookupTable(coefficients, R0, voltIn, numPoints, voltRange)
+    return _lookupTables[key]
+
+# Smallest power of two table density whose interpolation error is below maxError Celsius for every set
+def tableForError(coefficients, maxError, R0 = R0, voltIn = VOLT_IN, voltRange = None, maxPoints = 2**20):
+    numPoints = 256
+    table = lookupTable(coefficients, R0, voltIn, numPoints, voltRange)
+    while table.maxError().max() > maxError and numPoints < maxPoints:
+        numPoints *= 2
+        table = lookupTable(coefficients, R0, voltIn, numPoints, voltRange)
+    return table
+
+# Conversion function volts -> (temps, res) using either the exact equation or a lookup table
+def converter(coefficients, method = 'exact', R0 = R0, voltIn = VOLT_IN, numPoints = 4096):
+    if method == 'table':
+        return lookupTable(coefficients, R0, voltIn, numPoints).convert
+    return lambda volts: convert(volts, coefficients, R0, voltIn)
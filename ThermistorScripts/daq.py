@@ -0,0 +1,191 @@
+# Wrapper around the nidaqmx task reading the analog input channels of one DAQ device, or a simulated
+# device with the same interface for running the scripts without hardware (see simulation.py)
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Only the simulated devices are available without the NI-DAQmx driver and its Python package
+try:
+    import nidaqmx
+    from nidaqmx.constants import AcquisitionType, OverwriteMode
+    from nidaqmx.stream_readers import AnalogMultiChannelReader
+    RSE = nidaqmx.constants.TerminalConfiguration(10083) # Referenced Single-Ended
+except ImportError:
+    nidaqmx = None
+
+# DAQmx error codes raised when unread samples in the buffer were lost
+# -200279: the application did not keep up with the hardware acquisition
+# -200361: onboard device memory overflow
+OVERRUN_ERROR_CODES = (-200279, -200361)
+
+# Seconds of samples the acquisition buffer holds by default, so reads can fall behind for a while, such as
+# during a slow write or a full redraw of the plot, without losing samples. Shorter buffers overrun too easily
+BUFFER_SECONDS = 10.0
+MIN_BUFFER_SECONDS = 3.0
+
+class BufferOverrunError(Exception):
+    pass
+
+# Buffer size in samples per channel holding at least bufferSeconds of samples, in whole blocks and no
+# fewer than two of them
+def bufferSize(sampleRate, samplesPerBlock, bufferSeconds = BUFFER_SECONDS):
+    return samplesPerBlock * max(2, int(np.ceil(bufferSeconds * sampleRate / samplesPerBlock)))
+
+class DaqDevice:
+
+    def __init__(self, name, channels, minVal = 0, maxVal = 5):
+        if nidaqmx is None:
+            raise ImportError(f'nidaqmx is not installed, {name} can only be simulated (--simulate).')
+
+        self.name = name
+        self.channels = list(channels)
+
+        self.task = nidaqmx.Task()
+        for channel in self.channels:
+            self.task.ai_channels.add_ai_voltage_chan(f'{name}/ai{channel}', terminal_config = RSE, min_val = minVal, max_val = maxVal)
+
+        # Only used once configureBuffered() has been called
+        self.sampleRate = None
+        self.samplesPerBlock = None
+        self.bufferSize = None
+        self.reader = None
+        self.block = None
+        self.samplesRead = 0
+
+    # Use the hardware sample clock with continuous buffered acquisition, the driver buffer
+    # holds bufferSeconds of samples so reads can fall behind for a while without losing samples.
+    # clockSource = '' uses the onboard clock, otherwise a terminal such as '/Dev1/ai/SampleClock'
+    def configureBuffered(self, sampleRate, samplesPerBlock, bufferSeconds = BUFFER_SECONDS, clockSource = ''):
+        self.sampleRate = sampleRate
+        self.samplesPerBlock = samplesPerBlock
+        self.bufferSize = bufferSize(sampleRate, samplesPerBlock, bufferSeconds)
+
+        self.task.timing.cfg_samp_clk_timing(sampleRate, source = clockSource, sample_mode = AcquisitionType.CONTINUOUS, samps_per_chan = self.bufferSize)
+        self.task.in_stream.input_buf_size = self.bufferSize
+
+        # Raise an error instead of silently overwriting samples that have not been read yet
+        self.task.in_stream.over_write = OverwriteMode.DO_NOT_OVERWRITE_UNREAD_SAMPLES
+
+        self.reader = AnalogMultiChannelReader(self.task.in_stream)
+        self.block = np.zeros((len(self.channels), samplesPerBlock))
+
+    # Wait for a digital edge, such as another device's '/Dev1/ai/StartTrigger', before acquiring
+    def useStartTrigger(self, triggerSource):
+        self.task.triggers.start_trigger.cfg_dig_edge_start_trig(triggerSource)
+
+    def start(self):
+        self.task.start()
+
+    def stop(self):
+        self.task.stop()
+
+    def close(self):
+        self.task.close()
+
+    # Software timed read of one sample per channel
+    def read(self):
+        return np.atleast_1d(np.array(self.task.read(), dtype = float))
+
+    # Hardware timed read of the next block, returns the preallocated (channels, samplesPerBlock)
+    # array which is overwritten by the following call
+    def readBlock(self, timeout = 10.0):
+        try:
+            self.reader.read_many_sample(self.block, number_of_samples_per_channel = self.samplesPerBlock, timeout = timeout)
+        except nidaqmx.errors.DaqError as error:
+            if error.error_code in OVERRUN_ERROR_CODES:
+                raise BufferOverrunError(f'{self.name}: acquisition buffer overrun after {self.samplesRead} samples per channel, '
+                                         f'samples were lost. Use a larger block size, a longer buffer or a lower sample rate.') from error
+            raise
+
+        self.samplesRead += self.samplesPerBlock
+
+        # Warn before the buffer actually overruns
+        backlog = self.task.in_stream.avail_samp_per_chan
+        if backlog > self.bufferSize // 2:
+            logging.warning(f'{self.name}: {backlog} of {self.bufferSize} buffered samples per channel are unread, acquisition is falling behind.')
+
+        return self.block
+
+# Real device, or a simulated one when simulation is a configuration from simulation.loadSimulation()
+def openDevice(name, channels, simulation = None, minVal = 0, maxVal = 5):
+    if simulation is None:
+        return DaqDevice(name, channels, minVal, maxVal)
+
+    from simulation import SimulatedDevice
+    return SimulatedDevice(name, channels, minVal, maxVal, **simulation.deviceOptions(name))
+
+# Several devices read together in one coordinated step, each read returns one array per device
+# plus the measured skew between the devices in seconds
+class DeviceGroup:
+
+    def __init__(self, devices):
+        self.devices = list(devices)
+        self.synchronized = False
+        self.startTimes = None
+
+        # One worker per device so all reads are in flight at the same time
+        self.pool = ThreadPoolExecutor(max_workers = len(self.devices), thread_name_prefix = 'daq')
+
+    # Drive every device from the sample clock and start trigger of the first one. The devices must
+    # share timing lines (RTSI cable or PFI wiring), otherwise use configureBuffered() on each
+    def synchronize(self, sampleRate, samplesPerBlock, bufferSeconds = BUFFER_SECONDS):
+        master = self.devices[0]
+        master.configureBuffered(sampleRate, samplesPerBlock, bufferSeconds)
+
+        for device in self.devices[1:]:
+            device.configureBuffered(sampleRate, samplesPerBlock, bufferSeconds, clockSource = f'/{master.name}/ai/SampleClock')
+            device.useStartTrigger(f'/{master.name}/ai/StartTrigger')
+
+        self.synchronized = True
+
+    def configureBuffered(self, sampleRate, samplesPerBlock, bufferSeconds = BUFFER_SECONDS):
+        for device in self.devices:
+            device.configureBuffered(sampleRate, samplesPerBlock, bufferSeconds)
+
+    def start(self):
+        # Devices waiting on the start trigger have to be armed before the first device starts
+        order = self.devices[1:] + self.devices[:1] if self.synchronized else self.devices
+
+        self.startTimes = {}
+        for device in order:
+            device.start()
+            self.startTimes[device.name] = time.perf_counter()
+
+    def stop(self):
+        for device in self.devices:
+            device.stop()
+
+    def close(self):
+        for device in self.devices:
+            device.close()
+        self.pool.shutdown()
+
+    # Software timed read of one sample per channel from every device
+    def read(self):
+        results = list(self.pool.map(self._timedRead, self.devices))
+
+        # Each point is taken somewhere inside its read call, so the spread of the call midpoints
+        # estimates how far apart the devices sampled
+        midpoints = [(readStart + readEnd) / 2 for volts, readStart, readEnd in results]
+        skew = max(midpoints) - min(midpoints)
+
+        return [volts for volts, readStart, readEnd in results], skew
+
+    # Hardware timed read of the next block from every device, each is (channels, samplesPerBlock)
+    def readBlock(self):
+        blocks = list(self.pool.map(lambda device: device.readBlock(), self.devices))
+
+        # Blocks from a shared sample clock line up exactly, independent clocks are offset by
+        # the difference in their start times
+        if self.synchronized:
+            skew = 0.0
+        else:
+            skew = max(self.startTimes.values()) - min(self.startTimes.values())
+
+        return blocks, skew
+
+    def _timedRead(self, device):
+        readStart = time.perf_counter()
+        volts = device.read()
+        return volts, readStart, time.perf_counter()
@@ -0,0 +1,360 @@
+# Data collection shared by temp_DAQ.py, calTest.py and calibration.py: the command line, the devices of a
+# channel map, recording, the shared ring and publisher, timing, the acquisition loop, the live plot and
+# teardown. Each script is a DataCollection subclass that only says which columns it records, how it
+# converts a block of voltages and how its figure is laid out
+import argparse
+import logging
+import numpy as np
+from ringBuffer import RingBuffer
+from history import MinMaxHistory
+from plotting import redraw, timedAnimation
+from acquisition import AcquisitionThread
+from recording import openRecorder, DURABILITY_LEVELS, RECORDING_FORMATS
+from segments import SegmentedRecorder, recordingExists, isSegmented
+from sharedRing import SharedRingWriter
+from streaming import SamplePublisher, BACKPRESSURE_POLICIES
+from daq import DeviceGroup, BUFFER_SECONDS, MIN_BUFFER_SECONDS
+from simulation import loadSimulation
+from timing import stageTimer, TimingReporter
+from filtering import Decimator, FILTERS
+from readingLog import startLogging, ReadingSummary
+from scheduler import RunClock, LATE_POLICIES
+from channelMap import loadChannelMap, DEFAULT_CHANNEL_MAP
+
+class DataCollection:
+
+    # Shown by --help
+    description = 'Thermistor Data Collection'
+
+    # Channel map read unless -m/--channel_map names another
+    channelMapFile = DEFAULT_CHANNEL_MAP
+
+    # Whether the measured skew between the devices is recorded in a 'skew (s)' column
+    recordSkew = False
+
+    def __init__(self):
+        self.recordVolts = False
+        self.sync = False
+        self.alarmEngine = None
+
+    # Script specific arguments, at least the file name (dest file_name) and final time (dest final_time)
+    def addArguments(self, parser):
+        raise NotImplementedError
+
+    # File name used without -n/--file_name
+    def defaultFileName(self):
+        return None
+
+    def loadChannelMap(self):
+        return loadChannelMap(self.args.channel_map)
+
+    # Called once the channel map is loaded, for the converters and anything else the script needs
+    def setup(self):
+        pass
+
+    # Names of the converted columns recorded after the time column
+    def columns(self):
+        raise NotImplementedError
+
+    # Names of the readings that are summarized in the log and plotted
+    def readingNames(self):
+        raise NotImplementedError
+
+    # Convert the (samples, channels) volts into the (samples, columns()) converted columns and the
+    # (samples, readingNames()) readings
+    def convert(self, voltBlock):
+        raise NotImplementedError
+
+    # Reading columns shown in the history plot of the whole run
+    def historyColumns(self):
+        return range(len(self.readingNames()))
+
+    # Temperatures and resistances of the converted columns the alarm rules are checked on
+    def alarmInputs(self, converted):
+        raise NotImplementedError
+
+    # Metadata subscribers of the publisher get when they connect
+    def publisherMetadata(self):
+        return None
+
+    # Build the figure with matplotlib.pyplot plt, returns it with the LivePlot of the recent readings
+    # and the LivePlot of the history
+    def buildFigure(self, plt):
+        raise NotImplementedError
+
+    def parseArguments(self):
+        parser = argparse.ArgumentParser(description = self.description)
+        parser.add_argument('-t', '--time_interval',    help = 'Interval between each data collection, in seconds.')
+        self.addArguments(parser)
+        parser.add_argument('-w', '--window_length',    help = 'Number of most recent samples shown in the plots.', type = int, default = 50)
+        parser.add_argument('--history_length',         help = 'Number of min/max buckets the whole run is shown with in the history plot.', type = int, default = 1000)
+        parser.add_argument('-p', '--plot_interval',    help = 'Interval between each plot refresh, in seconds.', type = float, default = 1.0)
+        parser.add_argument('-r', '--sample_rate',      help = 'Hardware sample clock rate in Hz, enables buffered acquisition instead of --time_interval.', type = float)
+        parser.add_argument('-b', '--block_size',       help = 'Samples per channel read at a time in buffered acquisition, defaults to 0.1 s of samples.', type = int)
+        parser.add_argument('-o', '--oversample',       help = 'Run the sample clock this many times faster than the recorded rate and filter every channel down to the recorded rate, for lower noise readings.', type = int)
+        parser.add_argument('--buffer_seconds',         help = f'Seconds of samples the buffered acquisition buffer holds, so reads can fall behind for a while without losing samples, at least {MIN_BUFFER_SECONDS:g}.', type = float, default = BUFFER_SECONDS)
+        parser.add_argument('--filter',                 help = 'Filter applied before decimating oversampled blocks.', choices = FILTERS, default = 'boxcar')
+        parser.add_argument('--flush_rows',             help = 'Number of rows kept in memory before they are written to the file.', type = int, default = 100)
+        parser.add_argument('--flush_seconds',          help = 'Longest time in seconds rows are kept in memory before they are written to the file.', type = float, default = 1.0)
+        parser.add_argument('--durability',             help = 'What each write guarantees: buffered in Python, flushed to the OS, or fsynced to disk.', choices = DURABILITY_LEVELS, default = 'flush')
+        parser.add_argument('--format',                 help = 'File format of the recording, binary files can be converted to CSV with binToCsv.py.', choices = RECORDING_FORMATS, default = 'csv')
+        parser.add_argument('--segment_mb',             help = 'Start a new segment of the recording whenever the current one reaches this size in MB, listed in <file name>.segments.json.', type = float)
+        parser.add_argument('--segment_minutes',        help = 'Start a new segment of the recording whenever the current one covers this many minutes.', type = float)
+        parser.add_argument('--resume',                 help = 'Continue the interrupted segmented recording of the same name after its last complete row, with its timestamps and final time.', action = 'store_true')
+        parser.add_argument('--overwrite',              help = 'Replace an existing recording of the same name.', action = 'store_true')
+        parser.add_argument('--shared_ring',            help = 'Also publish every recorded row in a shared memory ring of this name, for viewer.py --shared and other processes to read live.')
+        parser.add_argument('--shared_ring_rows',       help = 'Number of most recent rows kept in the shared memory ring.', type = int, default = 100000)
+        parser.add_argument('--publish',                help = 'Also stream every recorded row to subscribers such as streamClient.py on this address, host:port or unix:path.')
+        parser.add_argument('--publish_rows',           help = 'Number of rows a subscriber may fall behind before it loses rows.', type = int, default = 10000)
+        parser.add_argument('--publish_policy',         help = 'Which rows a subscriber that fell too far behind loses, the oldest or every other one.', choices = BACKPRESSURE_POLICIES, default = 'drop')
+        parser.add_argument('--headless',               help = 'Record without plotting or importing matplotlib, for unattended runs. Follow the recording with viewer.py instead.', action = 'store_true')
+        parser.add_argument('--simulate',               help = 'Read simulated devices instead of the DAQ hardware, optionally configured by a JSON simulation file (see simulation.py).', nargs = '?', const = '', metavar = 'SIMULATION_FILE')
+        parser.add_argument('--timing',                 help = 'Time each stage of acquisition and plotting, logging p50/p99/max and missed deadlines every --timing_interval seconds.', action = 'store_true')
+        parser.add_argument('--timing_interval',        help = 'Interval between each timing summary, in seconds.', type = float, default = 10.0)
+        parser.add_argument('--metrics_file',           help = 'Also write the timing summary into this JSON file, implies --timing.')
+        parser.add_argument('--late',                   help = 'When data collection falls a whole interval behind, take the late samples back to back or skip them and flag the next row.', choices = LATE_POLICIES, default = 'catchup')
+        parser.add_argument('-m', '--channel_map',      help = 'JSON channel map of the devices and thermistors (see channelMap.py).', default = self.channelMapFile)
+        parser.add_argument('--log_interval',           help = 'Interval between each min/mean/max summary of the readings in the log, in seconds.', type = float, default = 10.0)
+        parser.add_argument('--debug',                  help = 'Also log every single sample.', action = 'store_true')
+
+        self.parser = parser
+        self.args = parser.parse_args()
+
+    # Reading data from the devices and recording it, runs on the acquisition thread
+    def acquire(self, cycle, skipped):
+        self.acquireTimer.start()
+
+        # Read one software timed sample, or the next hardware timed block, from all devices at once as (samples, channels).
+        # Samples of a block are timed by the sample clock, a single sample by when it was actually read
+        if self.buffered:
+            voltBlocks, skew = self.deviceGroup.readBlock()
+            voltBlock = self.decimator.process(np.vstack(voltBlocks).T)
+            times = self.clock.offset + (cycle * self.blockSize + np.arange(len(voltBlock))) * self.timeInterval
+        else:
+            (voltPoints, skew), readTime = self.clock.timed(self.deviceGroup.read)
+            voltBlock = np.concatenate(voltPoints)[np.newaxis]
+            times = np.array([readTime])
+        self.acquireTimer.mark('read')
+
+        # Convert the whole block for all thermistors at once
+        converted, readings = self.convert(voltBlock)
+        self.acquireTimer.mark('convert')
+
+        # Alarms are checked as soon as the block is converted, their actions run on their own threads
+        if self.alarmEngine is not None:
+            self.alarmEngine.check(times, *self.alarmInputs(converted))
+            self.acquireTimer.mark('alarm')
+
+        voltColumns = (voltBlock,) if self.recordVolts else ()
+        skewColumns = (np.full(len(times), skew),) if self.recordSkew else ()
+        rows = np.column_stack((times, converted, *voltColumns, *skewColumns, self.clock.utc(times), np.full(len(times), skipped)))
+        self.recorder.write(rows)
+        if self.sharedRing is not None:
+            self.sharedRing.write(rows)
+        if self.publisher is not None:
+            self.publisher.publish(rows)
+        self.acquireTimer.mark('record')
+
+        # Summarized in the log every --log_interval seconds
+        self.readingSummary.add(times, readings)
+        self.acquireTimer.mark('log')
+
+        # Keep the most recent readings in memory for plotting
+        if self.plotBuffer is not None:
+            self.plotBuffer.extend(times, readings)
+            self.historyBuffer.extend(times, readings[:, self.history])
+        self.acquireTimer.mark('buffer')
+        self.acquireTimer.end()
+
+    # Animation initialization script
+    def init(self):
+        return self.livePlot.init() + self.historyPlot.init()
+
+    # Real time plotting of the recent samples and the whole run so far, only the lines are redrawn unless
+    # the limits changed. The animation times the whole frame, including the blit (see plotting.timedAnimation)
+    def animate(self, frame):
+        t, window = self.plotBuffer.window()
+        self.plotTimer.mark('window')
+        lines = self.livePlot.update(t, window)
+        self.plotTimer.mark('update')
+        lines = lines + self.historyPlot.update(*self.historyBuffer.window())
+        self.plotTimer.mark('history')
+        redraw(self.fig, self.livePlot, self.historyPlot)
+        self.plotTimer.mark('redraw')
+        return lines
+
+    def run(self):
+        self.parseArguments()
+        args = self.args
+
+        if args.buffer_seconds < MIN_BUFFER_SECONDS:
+            self.parser.error(f'--buffer_seconds must be at least {MIN_BUFFER_SECONDS:g}, a shorter buffer overruns on the first slow write or redraw.')
+
+        # Never replace an earlier recording by accident
+        fileName = str(args.file_name or self.defaultFileName())
+        if recordingExists(fileName) and not (args.resume or args.overwrite):
+            self.parser.error(f'{fileName} already exists, continue its run with --resume or replace it with --overwrite.')
+        if args.resume and not isSegmented(fileName):
+            self.parser.error(f'{fileName} is not a segmented recording, only runs recorded with --segment_mb or --segment_minutes can be resumed.')
+
+        # Configuring the logger, records are written to the console by a separate thread
+        logListener = startLogging(debugReadings = args.debug)
+
+        # Assign start time and time interval for recording, both in seconds
+        if args.sample_rate:
+            # The sample clock sets the interval and each read waits for the hardware to fill a block
+            self.timeInterval = 1 / args.sample_rate
+            self.blockSize = args.block_size or max(1, int(args.sample_rate / 10))
+            readInterval = 0
+        else:
+            self.timeInterval = float(args.time_interval)
+            self.blockSize = 1
+            readInterval = self.timeInterval
+
+        # Oversampling runs the sample clock oversample times faster than timeInterval, the hardware then paces
+        # every read and each recorded sample is filtered from oversample samples of each channel
+        oversample = args.oversample or 1
+        self.buffered = bool(args.sample_rate or args.oversample)
+        if args.oversample:
+            readInterval = 0
+        aniInterval = int(args.plot_interval * 1000)
+
+        if not args.final_time:
+            numReads = None
+            logging.info('No final time specified, data collection will continue indefinitely.')
+        else:
+            finalTime = float(args.final_time)
+            numReads = int(np.ceil(((finalTime / self.timeInterval) + 1) / self.blockSize))
+
+        # Devices, thermistors and their coefficients
+        self.channelMap = self.loadChannelMap()
+        logging.info(f'{self.channelMap.numChannels} thermistors on {", ".join(device["name"] for device in self.channelMap.devices)}.')
+        self.setup()
+
+        # matplotlib is only imported when plotting. Importing it and building the figure take long enough
+        # to delay the first software timed sample or overrun the buffer of a running task, so both are
+        # done before any device is opened
+        if args.headless:
+            self.plotBuffer = None
+        else:
+            import matplotlib.pyplot as plt
+
+            # Buffers of the most recent readings and of the whole run shown in the plots
+            self.plotBuffer = RingBuffer(len(self.readingNames()), args.window_length)
+            self.history = list(self.historyColumns())
+            self.historyBuffer = MinMaxHistory(len(self.history), args.history_length)
+            self.fig, self.livePlot, self.historyPlot = self.buildFigure(plt)
+
+        # Initialize the nidaqmx task or the simulated devices
+        if args.simulate is None:
+            simulation = None
+            logging.info('Initializing nidaqmx task.')
+        else:
+            simulation = loadSimulation(args.simulate)
+            logging.info('Initializing simulated devices.')
+        self.deviceGroup = DeviceGroup(self.channelMap.openDevices(simulation))
+
+        if self.buffered:
+            logging.info(f'Buffered acquisition at {oversample / self.timeInterval:g} Hz, reading {self.blockSize * oversample} samples per channel at a time '
+                         f'into a {args.buffer_seconds:g} s buffer.')
+            if args.oversample:
+                logging.info(f'Recording one {args.filter} filtered sample of every {oversample} samples, every {self.timeInterval:g} s.')
+            if self.sync:
+                logging.info(f'The other devices follow the {self.channelMap.devices[0]["name"]} sample clock and start trigger.')
+                self.deviceGroup.synchronize(oversample / self.timeInterval, self.blockSize * oversample, args.buffer_seconds)
+            else:
+                self.deviceGroup.configureBuffered(oversample / self.timeInterval, self.blockSize * oversample, args.buffer_seconds)
+
+        # Filters carry their state from one block to the next
+        self.decimator = Decimator(self.channelMap.numChannels, oversample, args.filter)
+
+        # Open file for data recording
+        logging.info(f'Opening file {fileName} for data collection.')
+        voltNames = [f'volt{thermistor}' for thermistor in self.channelMap.thermistors] if self.recordVolts else []
+        fieldNames = ['time (s)'] + self.columns() + voltNames + (['skew (s)'] if self.recordSkew else []) + ['utc (s)', 'skipped']
+
+        segmented = bool(args.segment_mb or args.segment_minutes or args.resume)
+        if segmented:
+            segmentBytes = args.segment_mb and int(args.segment_mb * 1e6)
+            segmentSeconds = args.segment_minutes and args.segment_minutes * 60
+            self.recorder = SegmentedRecorder(fileName, fieldNames, args.format, args.flush_rows, args.flush_seconds, args.durability,
+                                              segmentBytes, segmentSeconds, resume = args.resume)
+        else:
+            self.recorder = openRecorder(fileName, fieldNames, args.format, args.flush_rows, args.flush_seconds, args.durability)
+
+        # Other processes attach to the ring by name while the run is going
+        self.sharedRing = SharedRingWriter(args.shared_ring, fieldNames, args.shared_ring_rows) if args.shared_ring else None
+
+        # Subscribers get the channel layout when they connect and lose rows rather than slow acquisition down
+        self.publisher = SamplePublisher(args.publish, fieldNames, self.publisherMetadata(), args.publish_rows, args.publish_policy) if args.publish else None
+
+        self.readingSummary = ReadingSummary(self.readingNames(), args.log_interval)
+
+        # Stage timing of every acquisition cycle and plot refresh, a cycle misses its deadline when it takes
+        # longer than the time its samples cover. Buffered reads mostly wait for the hardware to fill the block,
+        # so that wait does not count towards the deadline. A plot refresh includes the full redraw after the
+        # limits changed and the blit, and misses its deadline when it takes longer than --plot_interval
+        timing = args.timing or args.metrics_file is not None
+        stages = ['read', 'convert'] + (['alarm'] if self.alarmEngine is not None else []) + ['record', 'log', 'buffer']
+        self.acquireTimer = stageTimer('acquisition', stages, self.blockSize * self.timeInterval, timing,
+                                       waitStage = 'read' if self.buffered else None)
+        self.plotTimer = stageTimer('plot', ['window', 'update', 'history', 'redraw', 'blit'], args.plot_interval, timing)
+        if timing:
+            timingReporter = TimingReporter([self.acquireTimer, self.plotTimer], args.timing_interval, args.metrics_file)
+            timingReporter.start()
+
+        # The devices start last, right before the acquisition thread, so no other setup runs while the
+        # hardware is already filling its buffer. Sample times are measured from here, the hardware sample
+        # clock starts counting at the same moment
+        self.deviceGroup.start()
+        self.clock = RunClock()
+
+        # A resumed run keeps the timestamps and the final time of the interrupted one, a new segmented
+        # recording starts when the clock does
+        if args.resume:
+            self.clock.resume(self.recorder.startUtc)
+            logging.info(f'Resuming the run {self.clock.offset:.3f} s after it started.')
+            if numReads is not None:
+                numReads = max(0, int(np.ceil((((finalTime - self.clock.offset) / self.timeInterval) + 1) / self.blockSize)))
+        elif segmented:
+            self.recorder.setStartUtc(self.clock.startUtc)
+
+        acquisitionThread = AcquisitionThread(self.acquire, readInterval, numReads, args.late)
+
+        if args.headless:
+            # Record without plotting, the main thread only waits so Ctrl+C can end data collection
+            logging.info('Starting data collection without plotting, press Ctrl+C to stop.')
+            acquisitionThread.start()
+            try:
+                while acquisitionThread.is_alive():
+                    acquisitionThread.join(1.0)
+            except KeyboardInterrupt:
+                logging.info('Data collection stopped by the user.')
+
+        else:
+            # Start data collection in the background, the plot only shows what has been acquired so far
+            logging.info('Starting data collection and plotting animation.')
+            acquisitionThread.start()
+
+            ani = timedAnimation(self.fig, self.animate, self.plotTimer, init_func = self.init, interval = aniInterval, cache_frame_data = False)
+            plt.show()
+
+        # Data collection ends when the final time is reached, the plot window is closed or Ctrl+C is pressed
+        acquisitionThread.stop()
+        self.readingSummary.emit()
+        if self.alarmEngine is not None:
+            self.alarmEngine.close()
+        self.recorder.close()
+        if self.sharedRing is not None:
+            self.sharedRing.close()
+        if self.publisher is not None:
+            self.publisher.close()
+        if timing:
+            timingReporter.stop()
+
+        # Stop and close task
+        self.deviceGroup.stop()
+        self.deviceGroup.close()
+
+        # Write out the remaining log records
+        logListener.stop()
@@ -0,0 +1,68 @@
+# Per channel low-pass filtering and decimation of oversampled blocks, so the hardware can sample much
+# faster than the rows are recorded and every recorded row averages out the noise of many samples.
+# Filters work on whole (samples, channels) blocks at once and carry their state across blocks, so the
+# output does not depend on how the samples were split into blocks
+import numpy as np
+
+# 'boxcar' - mean of every factor samples
+# 'median' - median of every factor samples, ignores spikes
+# 'iir'    - single pole low-pass with its cutoff at half the output rate, then every factor-th sample
+FILTERS = ('boxcar', 'median', 'iir')
+
+class Decimator:
+
+    def __init__(self, numChannels, factor, method = 'boxcar'):
+        if method not in FILTERS:
+            raise ValueError(f'Unknown filter {method}, expected one of {FILTERS}.')
+
+        self.numChannels = numChannels
+        self.factor = factor
+        self.method = method
+
+        # Samples of an output that is not complete yet, kept for the next block
+        self.pending = np.empty((0, numChannels))
+
+        # y[n] = y[n - 1] + alpha (x[n] - y[n - 1]), started from the first sample
+        self.decay = np.exp(-np.pi / factor)
+        self.state = None
+
+        # Longest stretch the closed form of the IIR filter handles before decay ** -n overflows
+        self.segment = max(1, int(600 / -np.log(self.decay)))
+
+    # Filter a (samples, channels) block and return the (outputs, channels) decimated block, one output
+    # per factor samples including those left over from the previous block
+    def process(self, block):
+        if self.factor == 1:
+            return block
+
+        block = np.asarray(block, dtype = float)
+        if self.method == 'iir':
+            block = self._lowPass(block)
+
+        if len(self.pending):
+            block = np.concatenate((self.pending, block))
+        numOutputs = len(block) // self.factor
+        used = numOutputs * self.factor
+        self.pending = block[used:].copy()
+
+        groups = block[:used].reshape(numOutputs, self.factor, self.numChannels)
+        if self.method == 'boxcar':
+            return groups.mean(axis = 1)
+        if self.method == 'median':
+            return np.median(groups, axis = 1)
+        return groups[:, -1]
+
+    # Single pole low-pass of a whole block, using the closed form
+    #   y[n] = decay ** (n + 1) y[-1] + (1 - decay) sum_k decay ** (n - k) x[k]
+    # as cumulative sums over segments short enough for decay ** -n to stay finite
+    def _lowPass(self, block):
+        if self.state is None:
+            self.state = block[0].copy()
+
+        filtered = np.empty_like(block)
+        for start in range(0, len(block), self.segment):
+            segment = block[start:start + self.segment]
+            powers = self.decay ** np.arange(1, len(segment) + 1)[:, np.newaxis]
+            filtered[start:start + len(segment)] = powers * (self.state + (1 - self.decay) * np.cumsum(segment / powers, axis = 0))
+            self.state = filtered[start + len(segment) - 1].copy()
+        return filtered
@@ -0,0 +1,89 @@
+# Script used to fit the Steinhart-Hart coefficients of every thermistor from resistance recordings of
+# calibration.py at known reference temperatures. The runs are described by a JSON calibration file:
+#
+#   {
+#       "runs": [
+#           {
+#               "file": "resData.csv",
+#               "thermistors": {"res1 (ohm)": "T101", "res2 (ohm)": "T102"},
+#               "plateaus": [
+#                   {"start": 600, "end": 900, "temperature": 0.02},
+#                   {"start": 2400, "end": 2700, "temperature": 25.01}
+#               ]
+#           }
+#       ]
+#   }
+#
+# "thermistors" maps resistance columns to thermistor IDs and is optional, by default every 'res' column
+# is used with the number in its name as ID. A thermistor recorded in several runs is fitted to all its
+# plateaus. The coefficients are written into a coefficient file that temp_DAQ.py and calTest.py load
+import json
+import argparse
+import logging
+import numpy as np
+from fitting import fitSteinhartHart, plateauMeans
+from conversion import saveCoefficients, BATCH_ID
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(description = 'Thermistor Steinhart-Hart Coefficient Fit')
+parser.add_argument('calibration',              help = 'JSON calibration file listing the recordings and their temperature plateaus.')
+parser.add_argument('-o', '--output',           help = 'Coefficient file to write.', default = 'coefficients.json')
+parser.add_argument('--max_condition',          help = 'Warn about fits with a larger condition number, their coefficients are poorly determined.', type = float, default = 1e6)
+
+args = parser.parse_args()
+
+# Configuring the logger
+logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+with open(args.calibration) as calibrationFile:
+    runs = json.load(calibrationFile)['runs']
+
+# Plateau means of every run, one row per plateau and one column per thermistor across all runs
+thermistors = []
+blocks = []
+for run in runs:
+    runThermistors, means, temps = plateauMeans(run['file'], run['plateaus'], run.get('thermistors'))
+    logging.info(f'{run["file"]}: {len(runThermistors)} thermistors at {len(temps)} plateaus.')
+
+    thermistors += [thermistor for thermistor in runThermistors if thermistor not in thermistors]
+    blocks.append((runThermistors, means, temps))
+
+res = np.full((sum(len(temps) for _, _, temps in blocks), len(thermistors)), np.nan)
+temps = np.concatenate([temps for _, _, temps in blocks])
+row = 0
+for runThermistors, means, runTemps in blocks:
+    res[row:row + len(runTemps), [thermistors.index(thermistor) for thermistor in runThermistors]] = means
+    row += len(runTemps)
+
+# Every thermistor on its own, then all of them together as one batch
+coefficients, residuals, condition, numPoints = fitSteinhartHart(res, temps)
+batchCoefficients, batchResiduals, batchCondition, batchPoints = fitSteinhartHart(res.reshape(-1, 1), np.repeat(temps, len(thermistors)))
+
+fits = {}
+for index, thermistor in enumerate(thermistors + [BATCH_ID]):
+    if thermistor == BATCH_ID:
+        setCoefficients, setResiduals, setCondition, setPoints = batchCoefficients[0], batchResiduals[:, 0], batchCondition[0], batchPoints[0]
+    else:
+        setCoefficients, setResiduals, setCondition, setPoints = coefficients[index], residuals[:, index], condition[index], numPoints[index]
+
+    if setPoints < 3:
+        logging.warning(f'Thermistor {thermistor}: only {setPoints} plateaus, at least 3 are needed for a fit.')
+        continue
+
+    rms = np.sqrt(np.nanmean(setResiduals ** 2))
+    worst = np.nanmax(np.abs(setResiduals))
+    fits[thermistor] = {
+        'coefficients': setCoefficients.tolist(),
+        'points': int(setPoints),
+        'rms residual (C)': rms,
+        'max residual (C)': worst,
+        'condition number': setCondition,
+    }
+
+    logging.info(f'Thermistor {thermistor}: a {setCoefficients[0]:.9e}, b {setCoefficients[1]:.9e}, c {setCoefficients[2]:.9e}, '
+                 f'{setPoints} points, residual rms {rms * 1e3:.2f} mK, max {worst * 1e3:.2f} mK, condition {setCondition:.3g}')
+    if setCondition > args.max_condition:
+        logging.warning(f'Thermistor {thermistor}: condition number {setCondition:.3g}, the plateaus do not span enough temperatures.')
+
+saveCoefficients(args.output, fits, [run['file'] for run in runs])
+logging.info(f'Wrote the coefficients of {len(fits)} fits to {args.output}.')
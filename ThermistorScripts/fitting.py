@@ -0,0 +1,81 @@
+# Least squares fit of the Steinhart-Hart coefficients of many thermistors at once
+import re
+import numpy as np
+from recording import recordingColumns, recordingChunks, readChunk
+from segments import isSegmented, segmentFiles
+from conversion import steinhartHart
+
+# Fit 1 / T = a + b ln(R) + c ln(R)^3 for every thermistor in one batched solve. res is a (points, thermistors)
+# array of resistances and temps the matching reference temperatures in Celsius, either one per point
+# or one per point and thermistor. Missing points are NaN. Returns the (thermistors, 3) coefficients, the
+# (points, thermistors) residuals in Celsius, the condition number of each fit and the points per thermistor
+def fitSteinhartHart(res, temps):
+    res = np.asarray(res, dtype = float)
+    temps = np.asarray(temps, dtype = float)
+    if temps.ndim == 1:
+        temps = temps[:, np.newaxis]
+    temps = np.broadcast_to(temps, res.shape)
+
+    with np.errstate(invalid = 'ignore'):
+        valid = np.isfinite(res) & (res > 0) & np.isfinite(temps)
+    numPoints = valid.sum(axis = 0)
+
+    # Missing points become rows of zeros, which leave the least squares solution unchanged, so every
+    # thermistor has the same number of rows and all fits are solved together
+    logRes = np.log(np.where(valid, res, 1.0)).T
+    design = np.stack((np.ones_like(logRes), logRes, logRes * logRes * logRes), axis = -1) * valid.T[..., np.newaxis]
+    target = np.where(valid, 1 / (temps + 273.15), 0.0).T
+
+    # ln(R)^3 is about 1000 times ln(R), scaling every column to unit length keeps the solve well conditioned
+    scale = np.linalg.norm(design, axis = 1)
+    scale[scale == 0] = 1.0
+    scaled = design / scale[:, np.newaxis, :]
+
+    coefficients = (np.linalg.pinv(scaled) @ target[..., np.newaxis])[..., 0] / scale
+    condition = np.linalg.cond(scaled)
+
+    # Three coefficients need at least three points
+    coefficients[numPoints < 3] = np.nan
+    condition[numPoints < 3] = np.inf
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        residuals = np.where(valid, steinhartHart(res, coefficients) - temps, np.nan)
+    return coefficients, residuals, condition, numPoints
+
+# Thermistor ID of a resistance column, the number in its name ('res3 (ohm)' -> '3')
+def thermistorId(column):
+    match = re.search(r'\d+', column)
+    return match.group(0) if match else column
+
+# Mean resistance of every thermistor over each temperature plateau of a recording, segmented or not. plateaus
+# is a list of dicts with the 'start' and 'end' time of the plateau in seconds and its reference 'temperature',
+# thermistors maps resistance columns to thermistor IDs and defaults to every 'res' column. The recording is
+# read in chunks of chunkRows rows, so memory use does not depend on its length.
+# Returns the thermistor IDs, the (plateaus, thermistors) mean resistances and the plateau temperatures
+def plateauMeans(fileName, plateaus, thermistors = None, chunkRows = 100000):
+    files = segmentFiles(fileName) if isSegmented(fileName) else [fileName]
+    columns = recordingColumns(files[0])
+    if thermistors is None:
+        thermistors = {column: thermistorId(column) for column in columns if column.startswith('res')}
+
+    missing = [column for column in thermistors if column not in columns]
+    if missing:
+        raise ValueError(f'{fileName} has no columns {missing}.')
+
+    # NaN readings, such as an open channel, are left out of the mean, a thermistor with no readings on
+    # a plateau gets NaN for it
+    sums = np.zeros((len(plateaus), len(thermistors)))
+    counts = np.zeros((len(plateaus), len(thermistors)))
+    for file in files:
+        for chunk in recordingChunks(file, chunkRows):
+            rows = readChunk(file, chunk, [columns[0]] + list(thermistors))
+            times, res = rows[:, 0], rows[:, 1:]
+            for index, plateau in enumerate(plateaus):
+                inside = res[(times >= plateau['start']) & (times <= plateau['end'])]
+                finite = np.isfinite(inside)
+                sums[index] += np.where(finite, inside, 0.0).sum(axis = 0)
+                counts[index] += finite.sum(axis = 0)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        means = sums / counts
+    return list(thermistors.values()), means, np.array([plateau['temperature'] for plateau in plateaus], dtype = float)
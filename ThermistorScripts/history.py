@@ -0,0 +1,85 @@
+# Whole-run history of every channel at a fixed resolution for live plotting, kept as the min and max of
+# each bucket of samples. When all buckets are used, neighbouring buckets are merged in pairs and every
+# bucket covers twice as many samples from then on, so adding samples costs the same on average and
+# drawing the history costs the same however long the run has been going
+import threading
+import numpy as np
+
+class MinMaxHistory:
+
+    # length is the number of buckets shown, rounded up to an even number so buckets merge in pairs
+    def __init__(self, numChannels, length = 1000):
+        self.numChannels = numChannels
+        self.length = length + length % 2
+
+        # Time of the first sample and min and max of every channel in each bucket
+        self.times = np.zeros(self.length)
+        self.minimum = np.full((self.length, numChannels), np.nan)
+        self.maximum = np.full((self.length, numChannels), np.nan)
+
+        self.span = 1    # Samples per bucket
+        self.count = 0   # Buckets in use, the last one may still be filling
+        self.filled = 0  # Samples in the last bucket if it is still filling, otherwise 0
+
+        # Samples are added by the acquisition thread while the plot reads them
+        self.lock = threading.Lock()
+
+    # Add a block of rows, times has shape (N,) and block has shape (N, numChannels)
+    def extend(self, times, block):
+        times = np.asarray(times, dtype = float)
+        block = np.asarray(block, dtype = float).reshape(len(times), self.numChannels)
+
+        with self.lock:
+            start = 0
+            while start < len(times):
+                # Top up the last bucket first
+                if self.filled:
+                    take = min(self.span - self.filled, len(times) - start)
+                    rows = block[start:start + take]
+                    self.minimum[self.count - 1] = np.fmin(self.minimum[self.count - 1], np.fmin.reduce(rows, axis = 0))
+                    self.maximum[self.count - 1] = np.fmax(self.maximum[self.count - 1], np.fmax.reduce(rows, axis = 0))
+                    self.filled = (self.filled + take) % self.span
+                    start += take
+                    continue
+
+                if self.count == self.length:
+                    self._merge()
+
+                # Then as many new buckets as fit, the last of them possibly partly filled
+                take = min((self.length - self.count) * self.span, len(times) - start)
+                starts = np.arange(0, take, self.span)
+                buckets = slice(self.count, self.count + len(starts))
+                rows = block[start:start + take]
+
+                self.times[buckets] = times[start + starts]
+                self.minimum[buckets] = np.fmin.reduceat(rows, starts, axis = 0)
+                self.maximum[buckets] = np.fmax.reduceat(rows, starts, axis = 0)
+
+                self.count += len(starts)
+                self.filled = take % self.span
+                start += take
+
+    # Every bucket as two points at its time, its min and then its max, as (times, (points, channels))
+    # oldest first. Lines through these points cover the whole range the samples went through
+    def window(self):
+        with self.lock:
+            times = np.repeat(self.times[:self.count], 2)
+            data = np.empty((2 * self.count, self.numChannels))
+            data[0::2] = self.minimum[:self.count]
+            data[1::2] = self.maximum[:self.count]
+            return times, data
+
+    # Merge neighbouring buckets, halving the buckets in use, only called when every bucket is complete
+    def _merge(self):
+        half = self.length // 2
+        self.times[:half] = self.times[0::2]
+        self.minimum[:half] = np.fmin(self.minimum[0::2], self.minimum[1::2])
+        self.maximum[:half] = np.fmax(self.maximum[0::2], self.maximum[1::2])
+        self.minimum[half:] = np.nan
+        self.maximum[half:] = np.nan
+
+        self.count = half
+        self.span *= 2
+
+    def __len__(self):
+        return self.count
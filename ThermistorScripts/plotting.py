@@ -0,0 +1,128 @@
+# Live plot whose lines are created once and only have their data replaced each frame, for use with
+# FuncAnimation(blit = True) so a frame redraws just the lines instead of the whole figure
+import numpy as np
+
+# Draw the whole figure of the live plots again if any of them changed its limits, once for all of them.
+# New limits mean new ticks, so the cached background has to be drawn again. The animation notices the
+# changed view and copies the new background before blitting the lines. Returns True if it drew
+def redraw(fig, *plots):
+    if not any(plot.stale for plot in plots):
+        return False
+
+    fig.canvas.draw()
+    for plot in plots:
+        plot.stale = False
+    return True
+
+# FuncAnimation(blit = True) of animate(frame) with every frame timed as one cycle of timer, a
+# timing.StageTimer. animate marks its own stages, the first of them also covers restoring the background,
+# and drawing and blitting the changed lines is marked as 'blit'. matplotlib is only imported here, so
+# headless scripts can still import this module without it
+def timedAnimation(fig, animate, timer, **kwargs):
+    from matplotlib.animation import FuncAnimation
+
+    class TimedAnimation(FuncAnimation):
+
+        def _draw_next_frame(self, framedata, blit):
+            timer.start()
+            super()._draw_next_frame(framedata, blit)
+            timer.mark('blit')
+            timer.end()
+
+    return TimedAnimation(fig, animate, blit = True, **kwargs)
+
+class LivePlot:
+
+    # headroom is the fraction of the shown time span left free on the right of the time axis, and at
+    # least headroomFrames frames of new samples, so the time axis is only redrawn every few frames.
+    # Values get margin times their span above and below, at least minMargin, and the value axis only
+    # shrinks again once they take up less than shrink of it, so noise and slow drift do not move it
+    def __init__(self, fig, headroom = 0.5, margin = 0.1, minMargin = 0.5, headroomFrames = 5, shrink = 0.25):
+        self.fig = fig
+        self.headroom = headroom
+        self.margin = margin
+        self.minMargin = minMargin
+        self.headroomFrames = headroomFrames
+        self.shrink = shrink
+
+        self.axes = []
+        self.lines = []
+        self.lastTime = None
+
+        # Set when the limits changed, the figure has to be drawn again with redraw() before blitting
+        self.stale = False
+
+    # Add one line per column of the plot buffer window to ax, offsets are added to the values of each
+    # column so curves do not overlap, lineStyle is passed to every line. Returns the new lines
+    def addAxis(self, ax, columns, labels, offsets = 0, **lineStyle):
+        columns = list(columns)
+        offsets = np.broadcast_to(np.asarray(offsets, dtype = float), (len(columns),))
+
+        lines = [ax.plot([], [], label = label, animated = True, **lineStyle)[0] for label in labels]
+        self.axes.append((ax, columns, offsets, lines))
+        self.lines.extend(lines)
+        return lines
+
+    # FuncAnimation init_func, the lines start out empty
+    def init(self):
+        for line in self.lines:
+            line.set_data([], [])
+        return self.lines
+
+    # Show the (samples, columns) window against the times t, returns the changed lines for blitting.
+    # Call redraw() before they are blitted, in case the limits changed
+    def update(self, t, window):
+        if len(t) == 0:
+            return self.lines
+
+        # Time the samples advanced by since the previous frame. The first frame seeds the limits of every
+        # axis, taking the samples acquired so far as one frame's worth
+        advance = t[-1] - t[0] if self.lastTime is None else max(t[-1] - self.lastTime, 0.0)
+        self.lastTime = t[-1]
+
+        redraw = False
+        valueRanges = {}
+        for ax, columns, offsets, lines in self.axes:
+            values = window[:, columns] + offsets
+            for line, column in zip(lines, values.T):
+                line.set_data(t, column)
+
+            redraw |= self._fitTime(ax, t, advance)
+
+            # Values lost to an open or shorted thermistor are not plotted, so they do not set the limits
+            finite = values[np.isfinite(values)]
+            if finite.size:
+                valueRanges[ax] = (finite.min(), finite.max())
+
+        # Axes sharing their value axis are fitted to all their values at once, so they do not keep
+        # resetting each other's limits
+        fitted = set()
+        for ax in valueRanges:
+            if ax in fitted:
+                continue
+            group = [sibling for sibling in ax.get_shared_y_axes().get_siblings(ax) if sibling in valueRanges]
+            fitted.update(group)
+            redraw |= self._fitValues(ax, min(valueRanges[sibling][0] for sibling in group), max(valueRanges[sibling][1] for sibling in group))
+
+        self.stale |= redraw
+        return self.lines
+
+    def _fitTime(self, ax, t, advance):
+        low, high = ax.get_xlim()
+        if t[0] >= low and t[-1] <= high:
+            return False
+
+        span = (t[-1] - t[0]) or 1.0
+        ax.set_xlim(t[0], t[-1] + max(self.headroom * span, self.headroomFrames * advance))
+        return True
+
+    def _fitValues(self, ax, valueMin, valueMax):
+        margin = max(self.margin * (valueMax - valueMin), self.minMargin)
+        low, high = ax.get_ylim()
+        inside = valueMin >= low and valueMax <= high
+        loose = valueMax - valueMin + 2 * margin < self.shrink * (high - low)
+        if inside and not loose:
+            return False
+
+        ax.set_ylim(valueMin - margin, valueMax + margin)
+        return True
@@ -0,0 +1,93 @@
+# Logging of the readings off the acquisition path: records go through a queue to a listener thread that
+# does the console I/O, readings are summarized as min/mean/max per channel every few seconds and every
+# single sample is only logged at DEBUG
+import time
+import queue
+import logging
+import logging.handlers
+import numpy as np
+
+LOG_FORMAT = '[ %(levelname)s ]: %(message)s'
+
+# Logger of the readings, set to DEBUG for every sample without flooding the console with the DEBUG
+# records of other libraries
+READINGS_LOGGER = 'readings'
+
+# Configure the root logger like logging.basicConfig, but log records are only put on a queue by the
+# calling thread and written to the console by a listener thread. Returns the listener, stop() it at
+# the end of the script so every queued record is written
+def startLogging(level = logging.INFO, debugReadings = False):
+    logQueue = queue.SimpleQueue()
+    consoleHandler = logging.StreamHandler()
+    consoleHandler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # The queue handler only merges the arguments into the message, the console handler adds the level
+    queueHandler = logging.handlers.QueueHandler(logQueue)
+    queueHandler.setFormatter(logging.Formatter('%(message)s'))
+
+    listener = logging.handlers.QueueListener(logQueue, consoleHandler, respect_handler_level = True)
+    logging.basicConfig(level = level, handlers = [queueHandler])
+    logging.getLogger(READINGS_LOGGER).setLevel(logging.DEBUG if debugReadings else level)
+
+    listener.start()
+    return listener
+
+# Running min, mean and max of every channel, logged and restarted every interval seconds. names are the
+# channel names in column order, perLine the number of channels on each log line
+class ReadingSummary:
+
+    def __init__(self, names, interval = 10.0, perLine = 4, fmt = '.3f'):
+        self.names = list(names)
+        self.interval = interval
+        self.perLine = perLine
+        self.fmt = fmt
+        self.logger = logging.getLogger(READINGS_LOGGER)
+        self._reset()
+
+    # Add a (samples, channels) block of readings taken at times, logs the summary once interval seconds
+    # have passed since the last one
+    def add(self, times, block):
+        block = np.asarray(block, dtype = float)
+        finite = np.isfinite(block)
+
+        # NaN readings, such as an open channel, are left out of the statistics
+        self.minimum = np.fmin(self.minimum, np.fmin.reduce(block, axis = 0))
+        self.maximum = np.fmax(self.maximum, np.fmax.reduce(block, axis = 0))
+        self.total += np.where(finite, block, 0.0).sum(axis = 0)
+        self.count += finite.sum(axis = 0)
+
+        if self.firstTime is None:
+            self.firstTime = times[0]
+        self.lastTime = times[-1]
+        self.samples += len(times)
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for sampleTime, row in zip(times, block):
+                self.logger.debug(f'time: {sampleTime} \n' + self._lines([f'{name}, {value:{self.fmt}}' for name, value in zip(self.names, row)]))
+
+        if time.monotonic() - self.summaryStart >= self.interval:
+            self.emit()
+
+    # Log the summary of the readings added since the last one, if there are any
+    def emit(self):
+        if self.samples:
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                mean = self.total / self.count
+
+            values = [f'{name} {low:{self.fmt}}/{average:{self.fmt}}/{high:{self.fmt}}'
+                      for name, low, average, high in zip(self.names, self.minimum, mean, self.maximum)]
+            self.logger.info(f'time: {self.firstTime:.3f} - {self.lastTime:.3f} s, {self.samples} samples, min/mean/max \n' + self._lines(values))
+        self._reset()
+
+    def _reset(self):
+        numChannels = len(self.names)
+        self.minimum = np.full(numChannels, np.nan)
+        self.maximum = np.full(numChannels, np.nan)
+        self.total = np.zeros(numChannels)
+        self.count = np.zeros(numChannels, dtype = int)
+        self.samples = 0
+        self.firstTime = self.lastTime = None
+        self.summaryStart = time.monotonic()
+
+    def _lines(self, values):
+        return ''.join(f'          {"; ".join(values[first:first + self.perLine])}\n' for first in range(0, len(values), self.perLine))
@@ -0,0 +1,197 @@
+# Temperatures of existing recordings converted again under any number of Steinhart-Hart coefficient sets,
+# so runs recorded before coefficients were re-fitted can be regenerated and compared. Every data collection
+# script records the resistance of each thermistor, which is all the conversion needs, and temp_DAQ.py and
+# calTest.py can also record the divider voltages with --record_volts. Recordings are read in chunks like in
+# analysis.py and every chunk is converted under all sets in one broadcast pass
+import re
+import json
+import logging
+import contextlib
+import multiprocessing
+import numpy as np
+from recording import recordingColumns, recordingChunks, readChunk, UTC_COLUMN
+from segments import isSegmented, segmentFiles
+from conversion import steinhartHart, resistance, INDIVIDUAL_COEFFICIENTS, TOTAL_COEFFICIENTS, BATCH_ID, R0, VOLT_IN
+
+# Coefficient sets are given as
+# 'batch'        - built in batch calibration for every thermistor
+# 'individual'   - built in individual calibration of thermistors 1 - 8
+# 'NAME=FILE'    - each thermistor's own set in a coefficient file, its batch set for thermistors without one
+# 'NAME=FILE:ID' - the set of thermistor ID in a coefficient file for every thermistor
+BUILT_IN_SETS = ('batch', 'individual')
+
+# Thermistor ID of a resistance or voltage column, 'res3 (ohm)' -> '3', 'resT17' -> 'T17', 'volt5 (V)' -> '5'
+def columnThermistor(column):
+    match = re.fullmatch(r'(?:res|volt)(\S+?)(?: \(.*\))?', column)
+    return match.group(1) if match else None
+
+# Names and the (sets, thermistors, 3) coefficients of every set specification for the thermistor IDs
+def coefficientSets(specs, thermistors):
+    names = []
+    coefficients = []
+    for spec in specs:
+        if spec == 'batch':
+            names.append(spec)
+            coefficients.append(np.tile(TOTAL_COEFFICIENTS, (len(thermistors), 1)))
+            continue
+
+        if spec == 'individual':
+            unknown = [thermistor for thermistor in thermistors if thermistor not in [str(i) for i in range(1, 9)]]
+            if unknown:
+                raise ValueError(f'The built in individual calibration only covers thermistors 1 - 8, not {unknown}.')
+            names.append(spec)
+            coefficients.append(INDIVIDUAL_COEFFICIENTS[[int(thermistor) - 1 for thermistor in thermistors]])
+            continue
+
+        if '=' not in spec:
+            raise ValueError(f'Unknown coefficient set {spec}, expected one of {BUILT_IN_SETS}, NAME=FILE or NAME=FILE:ID.')
+        name, source = spec.split('=', 1)
+        fileName, _, thermistor = source.partition(':')
+        with open(fileName) as coefficientFile:
+            fileSets = json.load(coefficientFile)['thermistors']
+
+        if thermistor:
+            if thermistor not in fileSets:
+                raise ValueError(f'{fileName} has no coefficients for thermistor {thermistor}.')
+            resolved = [thermistor] * len(thermistors)
+        else:
+            fallback = BATCH_ID if BATCH_ID in fileSets else None
+            resolved = [thermistor if thermistor in fileSets else fallback for thermistor in thermistors]
+        names.append(name)
+        coefficients.append(np.array([fileSets[entry]['coefficients'] if entry else TOTAL_COEFFICIENTS for entry in resolved], dtype = float))
+
+    return names, np.array(coefficients)
+
+# Per set and thermistor sums of the temperatures, and of their difference from the first (reference)
+# set, over the rows where they are finite. Temperatures are shifted by shift before summing so the sums
+# of squares keep the small variations
+class ConversionComparison:
+
+    def __init__(self, shift):
+        shape = np.shape(shift)
+        self.shift = np.asarray(shift, dtype = float)
+        self.count = np.zeros(shape)
+        self.sum = np.zeros(shape)
+        self.sumSquares = np.zeros(shape)
+        self.minimum = np.full(shape, np.nan)
+        self.maximum = np.full(shape, np.nan)
+
+        self.differenceCount = np.zeros(shape)
+        self.differenceSum = np.zeros(shape)
+        self.differenceSumSquares = np.zeros(shape)
+        self.differenceMaximum = np.full(shape, np.nan)
+
+    # Add the (rows, sets, thermistors) temperatures
+    def add(self, temps):
+        finite = np.isfinite(temps)
+        shifted = np.where(finite, temps - self.shift, 0.0)
+        self.count += finite.sum(axis = 0)
+        self.sum += shifted.sum(axis = 0)
+        self.sumSquares += (shifted * shifted).sum(axis = 0)
+        self.minimum = np.fmin(self.minimum, np.fmin.reduce(np.where(finite, temps, np.nan), axis = 0))
+        self.maximum = np.fmax(self.maximum, np.fmax.reduce(np.where(finite, temps, np.nan), axis = 0))
+
+        with np.errstate(invalid = 'ignore'):
+            difference = temps - temps[:, :1]
+        finite = np.isfinite(difference)
+        difference = np.where(finite, difference, 0.0)
+        self.differenceCount += finite.sum(axis = 0)
+        self.differenceSum += difference.sum(axis = 0)
+        self.differenceSumSquares += (difference * difference).sum(axis = 0)
+        self.differenceMaximum = np.fmax(self.differenceMaximum, np.fmax.reduce(np.where(finite, np.abs(difference), np.nan), axis = 0))
+
+    def merge(self, other):
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        self.differenceMaximum = np.fmax(self.differenceMaximum, other.differenceMaximum)
+        for name in ('count', 'sum', 'sumSquares', 'differenceCount', 'differenceSum', 'differenceSumSquares'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    # One row per thermistor and set with its temperature statistics and its difference from the reference set
+    def table(self, setNames, thermistors):
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            mean = self.sum / self.count
+            std = np.sqrt(np.maximum(self.sumSquares - self.sum * mean, 0) / (self.count - 1))
+            differenceMean = self.differenceSum / self.differenceCount
+            differenceStd = np.sqrt(np.maximum(self.differenceSumSquares - self.differenceSum * differenceMean, 0) / (self.differenceCount - 1))
+
+        return [{
+            'thermistor': thermistor,
+            'set': setName,
+            'count': int(self.count[setIndex, index]),
+            'mean (C)': mean[setIndex, index] + self.shift[setIndex, index],
+            'std (C)': std[setIndex, index],
+            'min (C)': self.minimum[setIndex, index],
+            'max (C)': self.maximum[setIndex, index],
+            f'mean difference from {setNames[0]} (C)': differenceMean[setIndex, index],
+            f'std difference from {setNames[0]} (C)': differenceStd[setIndex, index],
+            f'max abs difference from {setNames[0]} (C)': self.differenceMaximum[setIndex, index],
+        } for index, thermistor in enumerate(thermistors) for setIndex, setName in enumerate(setNames)]
+
+# (rows, sets, thermistors) temperatures of the time, source and other columns of rows
+def convertRows(rows, coefficients, fromVolts, R0, voltIn):
+    source = rows[:, 1:1 + coefficients.shape[1]]
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        res = resistance(source, R0, voltIn) if fromVolts else source
+        return steinhartHart(res[:, np.newaxis], coefficients)
+
+# Derived rows and comparison sums of one chunk, run in the worker processes
+def convertChunk(task):
+    fileName, chunk, columns, coefficients, fromVolts, R0, voltIn, shift, derived = task
+    rows = readChunk(fileName, chunk, columns)
+    temps = convertRows(rows, coefficients, fromVolts, R0, voltIn)
+
+    comparison = ConversionComparison(shift)
+    comparison.add(temps)
+    derivedRows = np.column_stack((rows[:, :1], temps.reshape(len(rows), -1), rows[:, 1 + coefficients.shape[1]:])) if derived else None
+    return derivedRows, comparison
+
+# Convert every recording, segmented or not, under every coefficient set. thermistors maps source columns
+# to thermistor IDs and defaults to every resistance column (voltage column with fromVolts) with the ID in
+# its name. openDerived(fileName, columns), if given, returns the recorder the derived rows of a recording
+# are written into in time order. Returns one (thermistors, set names, ConversionComparison) per recording
+def reconvertRecordings(fileNames, setSpecs, thermistors = None, fromVolts = False, R0 = R0, voltIn = VOLT_IN,
+                        chunkRows = 100000, processes = 1, openDerived = None):
+    results = []
+    with multiprocessing.Pool(processes) if processes > 1 else contextlib.nullcontext() as pool:
+        for fileName in fileNames:
+            files = segmentFiles(fileName) if isSegmented(fileName) else [fileName]
+            names = recordingColumns(files[0])
+
+            prefix = 'volt' if fromVolts else 'res'
+            sources = thermistors or {column: columnThermistor(column) for column in names if column.startswith(prefix) and columnThermistor(column)}
+            missing = [column for column in sources if column not in names]
+            if missing or not sources:
+                raise ValueError(f'{fileName} has no {prefix} columns {missing or ""} to convert.')
+            ids = list(sources.values())
+            setNames, coefficients = coefficientSets(setSpecs, ids)
+
+            # Time, the source columns and the UTC column if there is one
+            columns = [names[0]] + list(sources) + ([UTC_COLUMN] if UTC_COLUMN in names else [])
+            chunks = [(file, chunk) for file in files for chunk in recordingChunks(file, chunkRows)]
+            if not chunks:
+                raise ValueError(f'{fileName} has no rows.')
+            logging.info(f'{fileName}: {len(ids)} thermistors under {len(setNames)} coefficient sets, {len(chunks)} chunks.')
+
+            # Shifted by the mean temperatures of the first chunk, thermistors without a finite reading in
+            # it, such as open or shorted channels, are not shifted
+            firstTemps = convertRows(readChunk(*chunks[0], columns), coefficients, fromVolts, R0, voltIn)
+            finite = np.isfinite(firstTemps)
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                shift = np.nan_to_num(np.where(finite, firstTemps, 0.0).sum(axis = 0) / finite.sum(axis = 0))
+
+            derivedColumns = [names[0]] + [f'temp{thermistor} [{setName}]' for setName in setNames for thermistor in ids] + columns[1 + len(ids):]
+            recorder = openDerived(fileName, derivedColumns) if openDerived else None
+
+            tasks = [(file, chunk, columns, coefficients, fromVolts, R0, voltIn, shift, recorder is not None) for file, chunk in chunks]
+            comparison = ConversionComparison(shift)
+            for derivedRows, chunkComparison in (pool.imap(convertChunk, tasks) if pool else map(convertChunk, tasks)):
+                comparison.merge(chunkComparison)
+                if recorder is not None:
+                    recorder.write(derivedRows)
+            if recorder is not None:
+                recorder.close()
+
+            results.append((ids, setNames, comparison))
+    return results
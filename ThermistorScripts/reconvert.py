@@ -0,0 +1,66 @@
+# Script used to convert existing recordings again under one or more coefficient sets, such as the built in
+# sets and coefficient files from fitCoefficients.py, and to compare the resulting temperatures with the
+# first set. Writes a comparison table for every recording and, with --derived, a recording of the
+# temperatures under every set. Recordings are read in chunks that can be shared among several processes
+import os
+import csv
+import argparse
+import logging
+import numpy as np
+from reconversion import reconvertRecordings
+from recording import openRecorder, RECORDING_FORMATS
+from conversion import R0, VOLT_IN
+
+# Worker processes import this script again, only the main process runs it
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description = 'Thermistor Recording Re-conversion')
+    parser.add_argument('file_names',               help = 'CSV, binary or segmented recordings to convert again.', nargs = '+')
+    parser.add_argument('-s', '--sets',             help = "Coefficient sets: 'batch', 'individual', NAME=FILE or NAME=FILE:ID (see reconversion.py). Differences are taken from the first.", nargs = '+', required = True)
+    parser.add_argument('-t', '--thermistors',      help = 'Source columns to convert as COLUMN=ID, defaults to every res<ID> column (volt<ID> column with --volts).', nargs = '+')
+    parser.add_argument('--volts',                  help = 'Convert the volt<ID> columns recorded with --record_volts instead of the resistance columns.', action = 'store_true')
+    parser.add_argument('--r0',                     help = 'Fixed divider resistance in ohm the voltages were recorded with.', type = float, default = R0)
+    parser.add_argument('--volt_in',                help = 'Divider supply voltage the voltages were recorded with.', type = float, default = VOLT_IN)
+    parser.add_argument('-o', '--output_dir',       help = 'Directory to write <recording name>-comparison.csv and <recording name>-reconverted.<format> into.', default = '.')
+    parser.add_argument('--derived',                help = 'Also write the temperatures under every set as a recording with temp<ID> [<set>] columns.', action = 'store_true')
+    parser.add_argument('--format',                 help = 'File format of the derived recording.', choices = RECORDING_FORMATS, default = 'csv')
+    parser.add_argument('-j', '--processes',        help = 'Number of processes sharing the chunks of each recording.', type = int, default = 1)
+    parser.add_argument('--chunk_rows',             help = 'Number of rows read at a time, memory use grows with it.', type = int, default = 100000)
+
+    args = parser.parse_args()
+
+    # Configuring the logger
+    logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+    thermistors = None
+    if args.thermistors:
+        if not all('=' in mapping for mapping in args.thermistors):
+            parser.error('--thermistors expects COLUMN=ID pairs.')
+        thermistors = dict(mapping.split('=', 1) for mapping in args.thermistors)
+
+    os.makedirs(args.output_dir, exist_ok = True)
+    extension = '.bin' if args.format == 'binary' else '.csv'
+
+    # The derived recording is named after the recording, whether or not it is segmented
+    def openDerived(fileName, columns):
+        derivedName = os.path.join(args.output_dir, os.path.splitext(os.path.basename(fileName))[0] + '-reconverted' + extension)
+        logging.info(f'Writing the temperatures under every set to {derivedName}.')
+        return openRecorder(derivedName, columns, args.format, flushRows = args.chunk_rows)
+
+    results = reconvertRecordings(args.file_names, args.sets, thermistors, args.volts, args.r0, args.volt_in,
+                                  args.chunk_rows, args.processes, openDerived if args.derived else None)
+
+    for fileName, (ids, setNames, comparison) in zip(args.file_names, results):
+        table = comparison.table(setNames, ids)
+        for setIndex, setName in enumerate(setNames[1:], 1):
+            with np.errstate(invalid = 'ignore'):
+                meanDifference = comparison.differenceSum[setIndex] / comparison.differenceCount[setIndex]
+            logging.info(f'{fileName}: {setName} differs from {setNames[0]} by {np.nanmean(meanDifference):+.4f} C on average, '
+                         f'at most {np.nanmax(comparison.differenceMaximum[setIndex]):.4f} C.')
+
+        tableName = os.path.join(args.output_dir, os.path.splitext(os.path.basename(fileName))[0] + '-comparison.csv')
+        with open(tableName, 'w', newline = '') as tableFile:
+            writer = csv.DictWriter(tableFile, fieldnames = list(table[0]))
+            writer.writeheader()
+            writer.writerows(table)
+        logging.info(f'Wrote the comparison of {len(setNames)} sets on {len(ids)} thermistors to {tableName}.')
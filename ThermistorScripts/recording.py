@@ -0,0 +1,277 @@
+# Long-lived recorders that keep the output file open and write rows in batches, as CSV text or as
+# a binary file of fixed width records with a JSON header that can be memory mapped when reading back
+import io
+import os
+import json
+import time
+import numpy as np
+
+# What a flush guarantees about the rows written so far:
+# 'buffered' - handed to Python's file buffer, lost if the script crashes
+# 'flush'    - handed to the operating system, survives a crash of the script
+# 'fsync'    - forced to disk, survives a crash of the machine
+DURABILITY_LEVELS = ('buffered', 'flush', 'fsync')
+
+RECORDING_FORMATS = ('csv', 'binary')
+
+BINARY_VERSION = 1
+
+# Absolute time column, seconds since the epoch need double precision and a fixed number of
+# decimals in CSV to keep their sub-millisecond part
+UTC_COLUMN = 'utc (s)'
+UTC_FORMAT = '%.6f'
+
+# Columns describing how a row was acquired rather than a measurement
+BOOKKEEPING_COLUMNS = ('skew (s)', UTC_COLUMN, 'skipped')
+
+# Per column CSV formats, fmt for everything except the UTC column
+def csvFormats(fieldNames, fmt = '%.10g'):
+    return [UTC_FORMAT if name == UTC_COLUMN else fmt for name in fieldNames]
+
+# Rows are kept in memory until flushRows rows are pending or flushSeconds have passed since the last
+# flush, so at most that much data is lost on a crash on top of what durability allows. Subclasses
+# open self.file and write the pending rows as one chunk in _writeRows()
+class Recorder:
+
+    def __init__(self, fileName, fieldNames, flushRows = 100, flushSeconds = 1.0, durability = 'flush'):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'Unknown durability {durability}, expected one of {DURABILITY_LEVELS}.')
+
+        self.fileName = fileName
+        self.fieldNames = list(fieldNames)
+        self.flushRows = flushRows
+        self.flushSeconds = flushSeconds
+        self.durability = durability
+
+        self.pending = []
+        self.pendingRows = 0
+        self.lastFlush = time.monotonic()
+
+    # Queue a (rows, columns) array, or a single row, with one value per field name
+    def write(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype = float))
+        self.pending.append(rows)
+        self.pendingRows += len(rows)
+
+        if self.pendingRows >= self.flushRows or time.monotonic() - self.lastFlush >= self.flushSeconds:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self._writeRows(np.vstack(self.pending))
+            self.pending = []
+            self.pendingRows = 0
+
+        if self.durability != 'buffered':
+            self.file.flush()
+        if self.durability == 'fsync':
+            os.fsync(self.file.fileno())
+
+        self.lastFlush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def _writeRows(self, rows):
+        raise NotImplementedError
+
+class CsvRecorder(Recorder):
+
+    def __init__(self, fileName, fieldNames, flushRows = 100, flushSeconds = 1.0, durability = 'flush', fmt = '%.10g'):
+        super().__init__(fileName, fieldNames, flushRows, flushSeconds, durability)
+        self.fmt = csvFormats(self.fieldNames, fmt)
+
+        self.file = open(fileName, 'w', newline = '')
+        self.file.write(','.join(self.fieldNames) + '\n')
+        self.flush()
+
+    def _writeRows(self, rows):
+        np.savetxt(self.file, rows, fmt = self.fmt, delimiter = ',')
+
+# Header file describing a binary recording, kept next to it as <fileName>.json
+def headerName(fileName):
+    return fileName + '.json'
+
+# Record layout of a binary recording, the first column (time) and the UTC column are float64 so long
+# runs keep their sub-millisecond resolution and every other column is float32
+def recordType(fieldNames):
+    return np.dtype([(name, '<f8' if index == 0 or name == UTC_COLUMN else '<f4') for index, name in enumerate(fieldNames)])
+
+# Appends each flush as one chunk of raw little endian records, one per row with all columns.
+# The data file holds nothing but whole records, so its size alone gives the number of rows and a
+# recording cut short by a crash can be read back up to the last complete record
+class BinaryRecorder(Recorder):
+
+    def __init__(self, fileName, fieldNames, flushRows = 100, flushSeconds = 1.0, durability = 'flush'):
+        super().__init__(fileName, fieldNames, flushRows, flushSeconds, durability)
+        self.dtype = recordType(self.fieldNames)
+
+        header = {
+            'version': BINARY_VERSION,
+            'columns': self.fieldNames,
+            'dtype': [self.dtype[name].str for name in self.fieldNames],
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        with open(headerName(fileName), 'w') as headerFile:
+            json.dump(header, headerFile, indent = 4)
+
+        self.file = open(fileName, 'wb')
+        self.flush()
+
+    def _writeRows(self, rows):
+        records = np.empty(len(rows), dtype = self.dtype)
+        for index, name in enumerate(self.fieldNames):
+            records[name] = rows[:, index]
+        self.file.write(records.tobytes())
+
+# Recorder for one of RECORDING_FORMATS
+def openRecorder(fileName, fieldNames, fileFormat = 'csv', flushRows = 100, flushSeconds = 1.0, durability = 'flush'):
+    if fileFormat == 'binary':
+        return BinaryRecorder(fileName, fieldNames, flushRows, flushSeconds, durability)
+    if fileFormat == 'csv':
+        return CsvRecorder(fileName, fieldNames, flushRows, flushSeconds, durability)
+    raise ValueError(f'Unknown recording format {fileFormat}, expected one of {RECORDING_FORMATS}.')
+
+# Memory map a binary recording as a structured array with one field per column, nothing is read
+# from disk until the fields or rows are accessed. A trailing partial record is ignored
+def openRecording(fileName):
+    with open(headerName(fileName)) as headerFile:
+        header = json.load(headerFile)
+
+    if header['version'] > BINARY_VERSION:
+        raise ValueError(f'{fileName} is a version {header["version"]} recording, newer than the supported version {BINARY_VERSION}.')
+
+    dtype = np.dtype(list(zip(header['columns'], header['dtype'])))
+    numRows = os.path.getsize(fileName) // dtype.itemsize
+    if numRows == 0:
+        return header, np.empty(0, dtype = dtype)
+    return header, np.memmap(fileName, dtype = dtype, mode = 'r', shape = (numRows,))
+
+# Rows of a binary recording with startTime <= time < endTime as a (rows, columns) float64 array of the
+# given columns, time first. Only the pages holding the requested time range are read from disk
+def readRange(fileName, startTime = None, endTime = None, columns = None):
+    header, records = openRecording(fileName)
+    timeName = header['columns'][0]
+    times = records[timeName]
+
+    start = 0 if startTime is None else np.searchsorted(times, startTime, side = 'left')
+    stop = len(records) if endTime is None else np.searchsorted(times, endTime, side = 'left')
+
+    names = [timeName] + [name for name in (columns or header['columns'][1:]) if name != timeName]
+    chunk = records[start:stop]
+    return np.column_stack([chunk[name].astype(float) for name in names])
+
+# Write a binary recording out in the CSV layout the scripts produce, chunkRows rows at a time
+def exportCsv(fileName, csvName, chunkRows = 100000, fmt = '%.10g'):
+    header, records = openRecording(fileName)
+
+    with open(csvName, 'w', newline = '') as csvFile:
+        csvFile.write(','.join(header['columns']) + '\n')
+        for start in range(0, len(records), chunkRows):
+            chunk = records[start:start + chunkRows]
+            np.savetxt(csvFile, np.column_stack([chunk[name].astype(float) for name in header['columns']]), fmt = csvFormats(header['columns'], fmt), delimiter = ',')
+
+    return len(records)
+
+# Column names of a CSV or binary recording
+def recordingColumns(fileName):
+    if os.path.exists(headerName(fileName)):
+        with open(headerName(fileName)) as headerFile:
+            return json.load(headerFile)['columns']
+
+    with open(fileName, 'rb') as csvFile:
+        return csvFile.readline().decode().strip().split(',')
+
+# Split a recording into pieces of about chunkRows rows that readChunk() can read independently of each
+# other, as (start, stop) record indices of a binary recording or byte offsets of whole lines of a CSV
+# recording. CSV pieces are sized from the length of the first row, so their row counts vary a little
+def recordingChunks(fileName, chunkRows = 100000):
+    if os.path.exists(headerName(fileName)):
+        header, records = openRecording(fileName)
+        return [(start, min(start + chunkRows, len(records))) for start in range(0, len(records), chunkRows)]
+
+    fileSize = os.path.getsize(fileName)
+    with open(fileName, 'rb') as csvFile:
+        dataStart = len(csvFile.readline())
+        chunkBytes = chunkRows * max(1, len(csvFile.readline()))
+
+        # Every piece starts at the beginning of the first line past its nominal offset
+        offsets = [dataStart]
+        while offsets[-1] + chunkBytes < fileSize:
+            csvFile.seek(offsets[-1] + chunkBytes - 1)
+            csvFile.readline()
+            if csvFile.tell() >= fileSize:
+                break
+            offsets.append(csvFile.tell())
+
+    return [(start, stop) for start, stop in zip(offsets, offsets[1:] + [fileSize]) if stop > start]
+
+# Rows of one piece from recordingChunks() as a (rows, columns) float64 array of the given columns, all
+# of them by default. A trailing partial row of a CSV recording that is still being written is left out
+def readChunk(fileName, chunk, columns = None):
+    start, stop = chunk
+    names = recordingColumns(fileName)
+    columns = columns or names
+
+    if os.path.exists(headerName(fileName)):
+        header, records = openRecording(fileName)
+        records = records[start:stop]
+        return np.column_stack([records[name].astype(float) for name in columns])
+
+    with open(fileName, 'rb') as csvFile:
+        csvFile.seek(start)
+        text = csvFile.read(stop - start)
+
+    end = text.rfind(b'\n') + 1
+    if end == 0:
+        return np.empty((0, len(columns)))
+    return np.loadtxt(io.BytesIO(text[:end]), delimiter = ',', ndmin = 2, usecols = [names.index(name) for name in columns])
+
+# Reads the rows appended to a CSV or binary recording since the previous call, so a recording can be
+# followed while another script is still writing it. Only complete rows are returned, a row that is
+# only partly written is returned by a later call
+class RecordingFollower:
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.binary = os.path.exists(headerName(fileName))
+
+        if self.binary:
+            with open(headerName(fileName)) as headerFile:
+                header = json.load(headerFile)
+            self.columns = header['columns']
+            self.dtype = np.dtype(list(zip(header['columns'], header['dtype'])))
+            self.position = 0
+        else:
+            with open(fileName, 'rb') as csvFile:
+                headerLine = csvFile.readline()
+            self.columns = headerLine.decode().strip().split(',')
+            self.position = len(headerLine)
+
+    # New rows as a (rows, columns) float64 array, empty if nothing was appended
+    def read(self):
+        if self.binary:
+            numRows = (os.path.getsize(self.fileName) - self.position) // self.dtype.itemsize
+            if numRows <= 0:
+                return np.empty((0, len(self.columns)))
+
+            records = np.fromfile(self.fileName, dtype = self.dtype, count = numRows, offset = self.position)
+            self.position += numRows * self.dtype.itemsize
+            return np.column_stack([records[name].astype(float) for name in self.columns])
+
+        with open(self.fileName, 'rb') as csvFile:
+            csvFile.seek(self.position)
+            text = csvFile.read()
+
+        end = text.rfind(b'\n') + 1
+        if end == 0:
+            return np.empty((0, len(self.columns)))
+
+        self.position += end
+        return np.loadtxt(io.BytesIO(text[:end]), delimiter = ',', ndmin = 2)
+
+# Whole recording, CSV or binary, as (column names, (rows, columns) float64 array)
+def readRecording(fileName):
+    follower = RecordingFollower(fileName)
+    return follower.columns, follower.read()
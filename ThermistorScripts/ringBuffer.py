@@ -0,0 +1,62 @@
+# Fixed-size ring buffer holding the most recent samples of every channel for live plotting
+import threading
+import numpy as np
+
+class RingBuffer:
+
+    def __init__(self, numChannels, length = 50):
+        self.numChannels = numChannels
+        self.length = length
+
+        # Every sample is stored twice, 'length' rows apart, so the current window is always
+        # one contiguous slice of the storage and reading it never has to reorder anything
+        self.times = np.zeros(2 * length)
+        self.data = np.zeros((2 * length, numChannels))
+
+        self.index = 0 # Position of the next write, always in [0, length)
+        self.count = 0 # Number of valid samples, saturates at length
+
+        # Samples are added by the acquisition thread while the plot reads them
+        self.lock = threading.Lock()
+
+    # Add one row of channel values recorded at the given time
+    def append(self, time, values):
+        with self.lock:
+            self.times[self.index] = time
+            self.times[self.index + self.length] = time
+            self.data[self.index] = values
+            self.data[self.index + self.length] = values
+
+            self.index = (self.index + 1) % self.length
+            self.count = min(self.count + 1, self.length)
+
+    # Add a block of rows, times has shape (N,) and block has shape (N, numChannels)
+    def extend(self, times, block):
+        times = np.asarray(times, dtype = float)
+        block = np.asarray(block, dtype = float).reshape(len(times), self.numChannels)
+
+        # Only the newest 'length' rows of a large block can end up in the window
+        if len(times) > self.length:
+            times = times[-self.length:]
+            block = block[-self.length:]
+
+        numRows = len(times)
+        with self.lock:
+            positions = (self.index + np.arange(numRows)) % self.length
+            self.times[positions] = times
+            self.times[positions + self.length] = times
+            self.data[positions] = block
+            self.data[positions + self.length] = block
+
+            self.index = (self.index + numRows) % self.length
+            self.count = min(self.count + numRows, self.length)
+
+    # Return a copy of the buffered times and channel data in chronological order, oldest first
+    def window(self):
+        with self.lock:
+            start = self.index + self.length - self.count
+            stop = self.index + self.length
+            return self.times[start:stop].copy(), self.data[start:stop].copy()
+
+    def __len__(self):
+        return self.count
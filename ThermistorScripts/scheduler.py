@@ -0,0 +1,86 @@
+# Drift free scheduling on the monotonic clock and timestamps for the recorded samples
+import time
+
+# What to do when acquisition falls a whole interval or more behind its schedule:
+# 'catchup' - acquire back to back until on schedule again, every scheduled sample is taken late
+# 'skip'    - drop the samples that are already late and continue with the next one on schedule
+LATE_POLICIES = ('catchup', 'skip')
+
+# Time of the run start on the monotonic clock together with the UTC time at that moment. Timestamps
+# are measured on the monotonic clock and only converted to UTC, so they do not jump when the
+# system clock is adjusted during a run
+class RunClock:
+
+    def __init__(self):
+        self.start()
+
+    def start(self):
+        before = time.monotonic()
+        utc = time.time()
+        after = time.monotonic()
+
+        self.startMonotonic = (before + after) / 2
+        self.startUtc = utc
+
+        # Seconds since the start of the run at the moment this process started timing it
+        self.offset = 0.0
+
+    # Continue timing a run that started at startUtc, for example after a crash. Times go on from the
+    # time that has passed since then, so they line up with the rows recorded before
+    def resume(self, startUtc):
+        self.offset = self.startUtc - startUtc
+        self.startMonotonic -= self.offset
+        self.startUtc = startUtc
+
+    # Seconds since start of a monotonic time, by default now
+    def elapsed(self, monotonicTime = None):
+        return (time.monotonic() if monotonicTime is None else monotonicTime) - self.startMonotonic
+
+    # UTC in seconds since the epoch of times in seconds since start
+    def utc(self, elapsed):
+        return self.startUtc + elapsed
+
+    # Call read() and return its result with the time in seconds since start halfway through the call,
+    # the best estimate of when a software timed read sampled
+    def timed(self, read):
+        before = time.monotonic()
+        result = read()
+        after = time.monotonic()
+        return result, self.elapsed((before + after) / 2)
+
+# Slot k is due at start + k * interval on the monotonic clock, computed from the slot number
+# rather than by adding up intervals so rounding and late cycles never accumulate into drift
+class Scheduler:
+
+    def __init__(self, interval, late = 'catchup'):
+        if late not in LATE_POLICIES:
+            raise ValueError(f'Unknown late policy {late}, expected one of {LATE_POLICIES}.')
+
+        self.interval = interval
+        self.late = late
+        self.start()
+
+    def start(self):
+        self.origin = time.monotonic()
+        self.slot = 0
+
+    # Move on to the next slot, returns how many slots were skipped because they were already late
+    def advance(self):
+        self.slot += 1
+        if self.late != 'skip' or self.interval <= 0:
+            return 0
+
+        behind = int((time.monotonic() - self.due()) // self.interval)
+        if behind <= 0:
+            return 0
+
+        self.slot += behind
+        return behind
+
+    # Monotonic time the current slot is due
+    def due(self):
+        return self.origin + self.slot * self.interval
+
+    # Wait until the current slot is due, returning early if stopEvent is set
+    def wait(self, stopEvent):
+        stopEvent.wait(max(0, self.due() - time.monotonic()))
@@ -0,0 +1,260 @@
+# Recordings split into segments of bounded size or duration, so a crash late in a long run only affects
+# the segment being written and no single file grows too large to open. Every segment is an ordinary CSV
+# or binary recording named <name>.<number><extension>, readable by every other script on its own. The
+# manifest <fileName>.segments.json lists the finished segments with their rows and time range, and the
+# segment being written as active
+#
+#   {"version": 1, "columns": [...], "format": "csv", "start utc": ..., "segments": [{"file": ..., "rows": ...,
+#    "start time": ..., "end time": ...}, ...], "active": "run.00003.csv", ...}
+#
+# A segment is finished by forcing it to disk and then replacing the manifest in one step, so after a crash
+# the manifest lists every finished segment and names the one that was cut short
+import os
+import json
+import time
+import logging
+import numpy as np
+from recording import openRecorder, readRange, RecordingFollower, headerName
+
+MANIFEST_VERSION = 1
+
+# Manifest of the segmented recording fileName
+def manifestName(fileName):
+    return fileName + '.segments.json'
+
+def isSegmented(fileName):
+    return os.path.exists(manifestName(fileName))
+
+# True if recording into fileName would replace an earlier recording, segmented or not
+def recordingExists(fileName):
+    return os.path.exists(fileName) or isSegmented(fileName)
+
+def readManifest(fileName):
+    with open(manifestName(fileName)) as manifestFile:
+        manifest = json.load(manifestFile)
+
+    if manifest['version'] > MANIFEST_VERSION:
+        raise ValueError(f'{fileName} has a version {manifest["version"]} manifest, newer than the supported version {MANIFEST_VERSION}.')
+    return manifest
+
+# Path of a segment listed in the manifest of fileName, segments are kept next to the manifest
+def segmentPath(fileName, segment):
+    return os.path.join(os.path.dirname(fileName), segment)
+
+# Paths of the segments of fileName in time order, including the one still being written
+def segmentFiles(fileName):
+    manifest = readManifest(fileName)
+    names = [segment['file'] for segment in manifest['segments']]
+    if manifest['active'] and os.path.exists(segmentPath(fileName, manifest['active'])):
+        names.append(manifest['active'])
+    return [segmentPath(fileName, name) for name in names]
+
+# Records into a new segment whenever the current one holds segmentBytes bytes or covers segmentSeconds
+# of the time column, with the same write(), flush() and close() as the recorders it creates. With resume,
+# the recording fileName is continued after the last complete row of an interrupted run, and startUtc is
+# replaced by the start of that run so the caller can continue its timestamps
+class SegmentedRecorder:
+
+    def __init__(self, fileName, fieldNames, fileFormat = 'csv', flushRows = 100, flushSeconds = 1.0, durability = 'flush',
+                 segmentBytes = None, segmentSeconds = None, startUtc = None, resume = False):
+        self.fileName = fileName
+        self.fieldNames = list(fieldNames)
+        self.recorderOptions = (fileFormat, flushRows, flushSeconds, durability)
+
+        root, extension = os.path.splitext(os.path.basename(fileName))
+        self.root = root
+        self.extension = extension or ('.bin' if fileFormat == 'binary' else '.csv')
+
+        if resume:
+            self.manifest = readManifest(fileName)
+            if self.manifest['columns'] != self.fieldNames:
+                raise ValueError(f'{fileName} was recorded with different columns, it cannot be resumed with these channels.')
+            if self.manifest['format'] != fileFormat:
+                raise ValueError(f'{fileName} was recorded as {self.manifest["format"]}, it cannot be resumed as {fileFormat}.')
+
+            self._recover()
+            self.manifest['resumed'].append(time.time())
+            logging.info(f'Resuming {fileName} after {len(self.manifest["segments"])} segments, {sum(segment["rows"] for segment in self.manifest["segments"])} rows.')
+        else:
+            if isSegmented(fileName):
+                self._remove(readManifest(fileName))
+            self.manifest = {
+                'version': MANIFEST_VERSION,
+                'columns': self.fieldNames,
+                'format': fileFormat,
+                'start utc': time.time() if startUtc is None else startUtc,
+                'segments': [],
+                'active': None,
+                'resumed': [],
+            }
+
+        # Limits given for this run, otherwise those the run was started with
+        self.manifest['segment bytes'] = segmentBytes or self.manifest.get('segment bytes')
+        self.manifest['segment seconds'] = segmentSeconds or self.manifest.get('segment seconds')
+        self.segmentBytes = self.manifest['segment bytes']
+        self.segmentSeconds = self.manifest['segment seconds']
+        self.startUtc = self.manifest['start utc']
+
+        self._openSegment()
+
+    def write(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype = float))
+        if len(rows) == 0:
+            return
+
+        self.recorder.write(rows)
+        if self.rows == 0:
+            self.startTime = rows[0, 0]
+        self.endTime = rows[-1, 0]
+        self.rows += len(rows)
+
+        # Checked after writing, so a segment ends on a whole block and may be one block over its limits
+        full = self.segmentBytes and os.fstat(self.recorder.file.fileno()).st_size >= self.segmentBytes
+        covered = self.segmentSeconds and self.endTime - self.startTime >= self.segmentSeconds
+        if full or covered:
+            self._finishSegment()
+            self._openSegment()
+
+    # Start of a new run in UTC, once the clock of a run that starts after the recorder was opened is
+    # running. A resumed recording keeps the start of the interrupted run
+    def setStartUtc(self, startUtc):
+        if self.manifest['resumed']:
+            return
+        self.manifest['start utc'] = self.startUtc = startUtc
+        self._writeManifest()
+
+    def flush(self):
+        self.recorder.flush()
+
+    def close(self):
+        self._finishSegment()
+        self._writeManifest()
+
+    def _openSegment(self):
+        name = f'{self.root}.{len(self.manifest["segments"]):05d}{self.extension}'
+        self.recorder = openRecorder(segmentPath(self.fileName, name), self.fieldNames, *self.recorderOptions)
+        self.rows = 0
+        self.startTime = self.endTime = None
+
+        self.manifest['active'] = name
+        self._writeManifest()
+
+    # Force the segment to disk before the manifest lists it as finished, an empty segment is removed
+    def _finishSegment(self):
+        self.recorder.flush()
+        os.fsync(self.recorder.file.fileno())
+        self.recorder.close()
+
+        name = self.manifest['active']
+        self.manifest['active'] = None
+        if self.rows:
+            self.manifest['segments'].append({'file': name, 'rows': self.rows, 'start time': self.startTime, 'end time': self.endTime})
+            logging.info(f'Finished segment {name}, {self.rows} rows from {self.startTime:.3f} to {self.endTime:.3f} s.')
+        else:
+            self._removeSegment(name)
+
+    # Written to a temporary file first and then replaced in one step, readers never see a partial manifest
+    def _writeManifest(self):
+        temporaryName = manifestName(self.fileName) + '.tmp'
+        with open(temporaryName, 'w') as manifestFile:
+            json.dump(self.manifest, manifestFile, indent = 4, default = float)
+            manifestFile.flush()
+            os.fsync(manifestFile.fileno())
+        os.replace(temporaryName, manifestName(self.fileName))
+
+    # List the segment an interrupted run was writing, cut back to its last complete row
+    def _recover(self):
+        name = self.manifest['active']
+        self.manifest['active'] = None
+        if not name or not os.path.exists(segmentPath(self.fileName, name)):
+            return
+
+        path = segmentPath(self.fileName, name)
+        follower = RecordingFollower(path)
+        rows = follower.read()
+        if len(rows) == 0:
+            self._removeSegment(name)
+            return
+
+        os.truncate(path, follower.position)
+        self.manifest['segments'].append({'file': name, 'rows': len(rows), 'start time': rows[0, 0], 'end time': rows[-1, 0]})
+        logging.info(f'Recovered {len(rows)} rows of the interrupted segment {name}.')
+
+    # Remove every segment of an earlier recording that is being replaced
+    def _remove(self, manifest):
+        for name in [segment['file'] for segment in manifest['segments']] + [manifest['active']]:
+            if name:
+                self._removeSegment(name)
+
+    def _removeSegment(self, name):
+        path = segmentPath(self.fileName, name)
+        for segmentFile in (path, headerName(path)):
+            if os.path.exists(segmentFile):
+                os.remove(segmentFile)
+
+# Rows of a segmented recording with startTime <= time < endTime as a (rows, columns) float64 array of the
+# given columns, time first. Only the segments whose time range overlaps the requested one are read
+def readSegments(fileName, startTime = None, endTime = None, columns = None):
+    manifest = readManifest(fileName)
+    timeName = manifest['columns'][0]
+    names = [timeName] + [name for name in (columns or manifest['columns'][1:]) if name != timeName]
+
+    # The time range of the active segment is only known once it is finished
+    overlapping = [segment['file'] for segment in manifest['segments']
+                   if (startTime is None or segment['end time'] >= startTime) and (endTime is None or segment['start time'] < endTime)]
+    if manifest['active'] and os.path.exists(segmentPath(fileName, manifest['active'])):
+        overlapping.append(manifest['active'])
+
+    blocks = [np.empty((0, len(names)))]
+    for name in overlapping:
+        path = segmentPath(fileName, name)
+        if manifest['format'] == 'binary':
+            blocks.append(readRange(path, startTime, endTime, names[1:]))
+            continue
+
+        follower = RecordingFollower(path)
+        rows = follower.read()
+        if len(rows) == 0:
+            continue
+        keep = np.ones(len(rows), dtype = bool)
+        if startTime is not None:
+            keep &= rows[:, 0] >= startTime
+        if endTime is not None:
+            keep &= rows[:, 0] < endTime
+        blocks.append(rows[keep][:, [follower.columns.index(name) for name in names]])
+
+    return np.concatenate(blocks)
+
+# Reads the rows added to a segmented recording since the previous call, across segments, like
+# recording.RecordingFollower
+class SegmentFollower:
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.columns = readManifest(fileName)['columns']
+
+        # Segment being read and the follower of that segment
+        self.index = 0
+        self.follower = None
+
+    def read(self):
+        manifest = readManifest(self.fileName)
+        finished = [segment['file'] for segment in manifest['segments']]
+        names = finished + ([manifest['active']] if manifest['active'] else [])
+
+        blocks = [np.empty((0, len(self.columns)))]
+        while self.index < len(names):
+            path = segmentPath(self.fileName, names[self.index])
+            if self.follower is None:
+                if not os.path.exists(path):
+                    break
+                self.follower = RecordingFollower(path)
+            blocks.append(self.follower.read())
+
+            # Move on once the segment is finished and read to its end
+            if self.index >= len(finished):
+                break
+            self.index += 1
+            self.follower = None
+
+        return np.concatenate(blocks)
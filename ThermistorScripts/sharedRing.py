@@ -0,0 +1,141 @@
+# Ring buffer of recorded rows in shared memory, written by the acquisition script and read by any number
+# of viewer, alarm or logger processes that attach to it by name without slowing acquisition down.
+# The segment starts with a header of 8 byte fields
+#
+#   magic, version, columns, capacity, reserved, committed, closed, layout length
+#
+# followed by the JSON list of column names and then capacity rows of float64 values, time first.
+# Row n of the run is stored at row n % capacity. The writer raises reserved to the row count it is
+# about to reach before overwriting any rows and raises committed to it once they are written, so a
+# reader knows which rows it copied are complete and which may have been overwritten while it copied
+import json
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+
+RING_MAGIC = int.from_bytes(b'THRMRING', 'little')
+RING_VERSION = 1
+
+# Names of the rings created by this process, the resource tracker removes these itself
+created = set()
+
+MAGIC, VERSION, COLUMNS, CAPACITY, RESERVED, COMMITTED, CLOSED, LAYOUT_LENGTH = range(8)
+HEADER_FIELDS = 8
+
+# Byte offset of the rows, after the header and the column names padded to 8 bytes
+def dataOffset(layoutLength):
+    return 8 * HEADER_FIELDS + (layoutLength + 7) // 8 * 8
+
+class SharedRingWriter:
+
+    # capacity is the number of most recent rows kept, readers that fall further behind lose rows
+    def __init__(self, name, columns, capacity = 100000):
+        self.columns = list(columns)
+        self.capacity = capacity
+        layout = json.dumps(self.columns).encode()
+        size = dataOffset(len(layout)) + 8 * capacity * len(self.columns)
+
+        try:
+            self.memory = shared_memory.SharedMemory(name, create = True, size = size)
+        except FileExistsError:
+            # Left behind by an acquisition that did not shut down cleanly
+            logging.warning(f'Replacing the stale shared memory ring {name}.')
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.memory = shared_memory.SharedMemory(name, create = True, size = size)
+
+        created.add(self.memory._name)
+        self.header = np.ndarray(HEADER_FIELDS, dtype = '<u8', buffer = self.memory.buf)
+        self.memory.buf[8 * HEADER_FIELDS:8 * HEADER_FIELDS + len(layout)] = layout
+        self.data = np.ndarray((capacity, len(self.columns)), dtype = '<f8', buffer = self.memory.buf, offset = dataOffset(len(layout)))
+
+        self.header[:] = [0, RING_VERSION, len(self.columns), capacity, 0, 0, 0, len(layout)]
+        self.header[MAGIC] = RING_MAGIC # Last, readers only attach to a complete header
+
+    # Publish a (rows, columns) block, only the newest capacity rows of a larger block are kept
+    def write(self, rows):
+        rows = np.asarray(rows, dtype = float).reshape(-1, len(self.columns))
+        committed = int(self.header[COMMITTED])
+        end = committed + len(rows)
+        rows = rows[-self.capacity:]
+
+        self.header[RESERVED] = end
+        self.data[(end - len(rows) + np.arange(len(rows))) % self.capacity] = rows
+        self.header[COMMITTED] = end
+
+    # Tell readers the run has ended and remove the segment, readers that are still attached keep
+    # their mapping until they close it
+    def close(self):
+        self.header[CLOSED] = 1
+        del self.header, self.data
+        self.memory.close()
+        self.memory.unlink()
+        created.discard(self.memory._name)
+
+class SharedRingReader:
+
+    # Attach to the ring published under name, starting at the oldest row still in it
+    def __init__(self, name):
+        self.memory = attach(name)
+        self.header = np.ndarray(HEADER_FIELDS, dtype = '<u8', buffer = self.memory.buf)
+        if self.header[MAGIC] != RING_MAGIC:
+            raise ValueError(f'{name} is not a thermistor shared memory ring.')
+        if self.header[VERSION] > RING_VERSION:
+            raise ValueError(f'{name} is a version {self.header[VERSION]} ring, newer than the supported version {RING_VERSION}.')
+
+        layoutLength = int(self.header[LAYOUT_LENGTH])
+        self.columns = json.loads(bytes(self.memory.buf[8 * HEADER_FIELDS:8 * HEADER_FIELDS + layoutLength]))
+        self.capacity = int(self.header[CAPACITY])
+        self.data = np.ndarray((self.capacity, len(self.columns)), dtype = '<f8', buffer = self.memory.buf, offset = dataOffset(layoutLength))
+
+        self.position = max(0, int(self.header[COMMITTED]) - self.capacity)
+        self.lost = 0
+
+    # True once the writer has closed the ring
+    @property
+    def closed(self):
+        return bool(self.header[CLOSED])
+
+    # Rows written since the previous call as a (rows, columns) float64 array, like
+    # recording.RecordingFollower.read(). Rows overwritten before they could be read are counted in lost
+    def read(self):
+        start, rows = self._copy(self.position, int(self.header[COMMITTED]))
+        if start > self.position:
+            logging.warning(f'Shared memory ring lapped this reader, {start - self.position} rows were lost.')
+            self.lost += start - self.position
+        self.position = start + len(rows)
+        return rows
+
+    # The newest numRows rows, without changing what read() returns next
+    def latest(self, numRows):
+        committed = int(self.header[COMMITTED])
+        return self._copy(max(0, committed - numRows), committed)[1]
+
+    def close(self):
+        del self.header, self.data
+        self.memory.close()
+
+    # Copy rows start to end, returning the first row that was not overwritten during the copy and the rows
+    def _copy(self, start, end):
+        start = max(start, end - self.capacity)
+        rows = self.data[np.arange(start, end) % self.capacity]
+
+        # Rows below reserved - capacity may have been overwritten while they were copied
+        overwritten = int(self.header[RESERVED]) - self.capacity
+        if overwritten > start:
+            rows = rows[min(overwritten, end) - start:]
+            start = min(overwritten, end)
+        return start, rows
+
+# Attach to an existing segment without the resource tracker removing it when this process exits
+def attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track = False)
+    except TypeError:
+        # Python before 3.13 always tracks attached segments
+        from multiprocessing import resource_tracker
+        memory = shared_memory.SharedMemory(name)
+        if memory._name not in created:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return memory
@@ -0,0 +1,181 @@
+# Simulated DAQ device producing thermistor divider voltages, with the same interface as daq.DaqDevice
+# so the scripts can be run and profiled without hardware. Every channel follows
+#
+#   temperature + ramp * t + stepSize * (t >= stepTime) + random walk drift
+#
+# converted to the divider voltage with the inverse Steinhart-Hart equation, plus voltage noise.
+# A simulation file sets the signals in JSON, any channel not listed uses the default signal:
+#
+#   {
+#       "seed": 1,
+#       "realtime": true,
+#       "default": {"temperature": 20.0, "noise": 0.0005},
+#       "devices": {
+#           "Dev1": {"2": {"ramp": 0.05}, "5": {"fault": "open"}},
+#           "Dev2": {"0": {"stepTime": 60, "stepSize": 5.0}, "7": {"fault": "short"}}
+#       }
+#   }
+import json
+import time
+import logging
+import numpy as np
+from daq import BufferOverrunError, BUFFER_SECONDS, bufferSize
+from conversion import inverseSteinhartHart, dividerVoltage, TOTAL_COEFFICIENTS, R0, VOLT_IN
+
+# Signal of each channel, temperatures in Celsius, times in seconds, noise in volts rms and drift in
+# Celsius per square root second. fault is None, 'open' (reads the full supply) or 'short' (reads 0 V)
+DEFAULT_SIGNAL = {
+    'temperature': 20.0,
+    'ramp': 0.0,
+    'stepTime': None,
+    'stepSize': 0.0,
+    'noise': 0.0005,
+    'drift': 0.01,
+    'fault': None,
+    'coefficients': TOTAL_COEFFICIENTS.tolist(),
+}
+
+FAULTS = (None, 'open', 'short')
+
+class SimulatedDevice:
+
+    # default overrides DEFAULT_SIGNAL for every channel and signals maps a channel number to the
+    # settings of that channel. realtime = False produces blocks as fast as they are read, for benchmarks
+    def __init__(self, name, channels, minVal = 0, maxVal = 5, default = None, signals = None, seed = None, realtime = True):
+        self.name = name
+        self.channels = list(channels)
+        self.minVal = minVal
+        self.maxVal = maxVal
+        self.realtime = realtime
+
+        settings = [self._signal(channel, default or {}, (signals or {}).get(channel, {})) for channel in self.channels]
+        self.temperature = np.array([signal['temperature'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.ramp = np.array([signal['ramp'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.stepTime = np.array([np.inf if signal['stepTime'] is None else signal['stepTime'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.stepSize = np.array([signal['stepSize'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.noise = np.array([signal['noise'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.drift = np.array([signal['drift'] for signal in settings], dtype = float)[:, np.newaxis]
+        self.coefficients = np.array([signal['coefficients'] for signal in settings], dtype = float)[:, np.newaxis, :]
+        self.open = np.array([signal['fault'] == 'open' for signal in settings])
+        self.short = np.array([signal['fault'] == 'short' for signal in settings])
+
+        self.rng = np.random.default_rng(seed)
+        self.driftState = np.zeros((len(self.channels), 1))
+        self.lastTime = 0.0
+        self.startTime = None
+
+        # Only used once configureBuffered() has been called
+        self.sampleRate = None
+        self.samplesPerBlock = None
+        self.bufferSize = None
+        self.block = None
+        self.samplesRead = 0
+
+    # Same arguments as DaqDevice, the simulated buffer overruns when reads fall bufferSeconds behind
+    def configureBuffered(self, sampleRate, samplesPerBlock, bufferSeconds = BUFFER_SECONDS, clockSource = ''):
+        self.sampleRate = sampleRate
+        self.samplesPerBlock = samplesPerBlock
+        self.bufferSize = bufferSize(sampleRate, samplesPerBlock, bufferSeconds)
+        self.block = np.zeros((len(self.channels), samplesPerBlock))
+
+    # Simulated devices all run from the same clock, so there is nothing to route
+    def useStartTrigger(self, triggerSource):
+        pass
+
+    def start(self):
+        self.startTime = time.monotonic()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    # Software timed read of one sample per channel at the current time
+    def read(self):
+        return self._voltages(np.array([time.monotonic() - self.startTime]))[:, 0]
+
+    # Next block of samplesPerBlock samples per channel, waiting until the block would have been acquired
+    # when realtime. Returns the preallocated (channels, samplesPerBlock) array, like DaqDevice
+    def readBlock(self, timeout = 10.0):
+        blockEnd = (self.samplesRead + self.samplesPerBlock) / self.sampleRate
+
+        if self.realtime:
+            wait = blockEnd - (time.monotonic() - self.startTime)
+            if wait > 0:
+                time.sleep(min(wait, timeout))
+
+            # Samples the hardware would have acquired beyond this block without them being read yet
+            backlog = int((time.monotonic() - self.startTime) * self.sampleRate) - self.samplesRead - self.samplesPerBlock
+            if backlog + self.samplesPerBlock > self.bufferSize:
+                raise BufferOverrunError(f'{self.name}: acquisition buffer overrun after {self.samplesRead} samples per channel, '
+                                         f'samples were lost. Use a larger block size, a longer buffer or a lower sample rate.')
+
+        times = (self.samplesRead + np.arange(self.samplesPerBlock)) / self.sampleRate
+        self.block[:] = self._voltages(times)
+        self.samplesRead += self.samplesPerBlock
+
+        if self.realtime and backlog > self.bufferSize // 2:
+            logging.warning(f'{self.name}: {backlog} of {self.bufferSize} buffered samples per channel are unread, acquisition is falling behind.')
+
+        return self.block
+
+    # (channels, samples) divider voltages at the given times since start
+    def _voltages(self, times):
+        numChannels, numSamples = len(self.channels), len(times)
+
+        # Random walk continued from the end of the previous read
+        steps = np.sqrt(np.diff(times, prepend = self.lastTime).clip(0)) * self.rng.standard_normal((numChannels, numSamples))
+        walk = self.driftState + np.cumsum(self.drift * steps, axis = 1)
+        self.driftState = walk[:, -1:]
+        self.lastTime = times[-1]
+
+        temps = self.temperature + self.ramp * times + self.stepSize * (times >= self.stepTime) + walk
+        volts = dividerVoltage(inverseSteinhartHart(temps, self.coefficients), R0, VOLT_IN)
+        volts += self.noise * self.rng.standard_normal((numChannels, numSamples))
+
+        volts[self.open] = VOLT_IN
+        volts[self.short] = 0.0
+        return np.clip(volts, self.minVal, self.maxVal, out = volts)
+
+    def _signal(self, channel, default, override):
+        signal = {**DEFAULT_SIGNAL, **default, **override}
+
+        unknown = set(signal) - set(DEFAULT_SIGNAL)
+        if unknown:
+            raise ValueError(f'{self.name}/ai{channel}: unknown simulation settings {sorted(unknown)}, expected {sorted(DEFAULT_SIGNAL)}.')
+        if signal['fault'] not in FAULTS:
+            raise ValueError(f'{self.name}/ai{channel}: unknown fault {signal["fault"]}, expected one of {FAULTS}.')
+        return signal
+
+# Signals of every simulated device, read from a simulation file by loadSimulation()
+class Simulation:
+
+    def __init__(self, default = None, devices = None, seed = None, realtime = True):
+        self.default = default or {}
+        self.devices = devices or {}
+        self.seed = seed
+        self.realtime = realtime
+
+    # Keyword arguments of SimulatedDevice for the device called name, each device gets its own
+    # random numbers derived from the seed
+    def deviceOptions(self, name):
+        return {
+            'default': self.default,
+            'signals': {int(channel): signal for channel, signal in self.devices.get(name, {}).items()},
+            'seed': None if self.seed is None else [self.seed] + list(name.encode()),
+            'realtime': self.realtime,
+        }
+
+# Simulation described by a JSON file, or the default signal on every channel if fileName is empty
+def loadSimulation(fileName = None):
+    if not fileName:
+        return Simulation()
+
+    with open(fileName) as simulationFile:
+        config = json.load(simulationFile)
+
+    unknown = set(config) - {'default', 'devices', 'seed', 'realtime'}
+    if unknown:
+        raise ValueError(f'{fileName}: unknown simulation settings {sorted(unknown)}.')
+    return Simulation(**config)
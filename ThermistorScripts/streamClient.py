@@ -0,0 +1,59 @@
+# Reference client of the live sample stream of a data collection script started with --publish. Logs
+# the received rows every interval and can record them into a file of its own, for example on another
+# lab machine
+import time
+import argparse
+import logging
+from streaming import SampleSubscriber
+from recording import openRecorder, BOOKKEEPING_COLUMNS, RECORDING_FORMATS
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(description = 'Thermistor Sample Stream Client')
+parser.add_argument('address',                  help = 'Address the data collection script publishes on, host:port or unix:path.')
+parser.add_argument('-c', '--columns',          help = 'Names of the columns to log, defaults to the first 4 measured columns.', nargs = '+')
+parser.add_argument('-i', '--interval',         help = 'Interval between each log line, in seconds.', type = float, default = 5.0)
+parser.add_argument('-f', '--file_name',        help = 'Also record every received row into this file.')
+parser.add_argument('--format',                 help = 'File format of the recording.', choices = RECORDING_FORMATS, default = 'csv')
+
+args = parser.parse_args()
+
+# Configuring the logger
+logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+subscriber = SampleSubscriber(args.address)
+columns = args.columns or [name for name in subscriber.columns[1:] if name not in BOOKKEEPING_COLUMNS][:4]
+for name in columns:
+    if name not in subscriber.columns:
+        parser.error(f'The stream has no column {name}, its columns are {", ".join(subscriber.columns)}.')
+indices = [subscriber.columns.index(name) for name in columns]
+logging.info(f'Subscribed to {args.address}, {len(subscriber.columns)} columns.')
+
+recorder = openRecorder(args.file_name, subscriber.columns, args.format) if args.file_name else None
+
+received = 0
+frames = 0
+lastLog = time.monotonic()
+try:
+    while True:
+        rows = subscriber.read()
+        if rows is None:
+            logging.info('The publisher closed the stream.')
+            break
+
+        received += len(rows)
+        frames += 1
+        if recorder is not None:
+            recorder.write(rows)
+
+        now = time.monotonic()
+        if now - lastLog >= args.interval and len(rows):
+            latest = ', '.join(f'{name} {value:.3f}' for name, value in zip(columns, rows[-1, indices]))
+            logging.info(f'{received} rows in {frames} frames, {subscriber.lost} left out, at {rows[-1, 0]:.3f} s: {latest}')
+            lastLog = now
+except KeyboardInterrupt:
+    pass
+
+logging.info(f'Received {received} rows in {frames} frames, {subscriber.lost} rows were left out.')
+subscriber.close()
+if recorder is not None:
+    recorder.close()
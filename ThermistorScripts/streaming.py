@@ -0,0 +1,219 @@
+# Live rows streamed over TCP or a Unix socket to any number of subscribers, such as the slow control
+# dashboard or loggers on other lab machines. The acquisition thread only hands each block of rows to an
+# asyncio event loop running in its own thread. Every subscriber is served by its own coroutine from its
+# own queue of pending rows, so a slow or stalled subscriber loses rows instead of holding up acquisition.
+# A subscriber first receives
+#
+#   b'THRMSTRM', version (u4), layout length (u4), JSON layout {"columns": [...], ...}
+#
+# and then frames of
+#
+#   rows (u8), lost (u8), rows x columns float64 values, time first
+#
+# all little endian, where lost is the number of rows left out for this subscriber since it connected
+import os
+import json
+import socket
+import struct
+import asyncio
+import logging
+import threading
+import numpy as np
+
+STREAM_MAGIC = b'THRMSTRM'
+STREAM_VERSION = 1
+
+GREETING = struct.Struct('<8sII')
+FRAME = struct.Struct('<QQ')
+
+# What happens to the pending rows of a subscriber that falls more than maxRows rows behind:
+# 'drop'     - the oldest rows are left out, the subscriber gets the newest rows at full resolution
+# 'coalesce' - every other row is left out until they fit, the subscriber gets the whole span at lower resolution
+BACKPRESSURE_POLICIES = ('drop', 'coalesce')
+
+# 'host:port' or 'unix:path', returned as (host, port) or (None, path)
+def parseAddress(address):
+    if address.startswith('unix:'):
+        return None, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+# Rows waiting to be sent to one subscriber, only used on the event loop thread
+class Subscription:
+
+    def __init__(self, maxRows, policy):
+        self.maxRows = maxRows
+        self.policy = policy
+        self.pending = []
+        self.numPending = 0
+        self.lost = 0
+        self.closing = False
+        self.ready = asyncio.Event()
+
+    def add(self, rows):
+        self.pending.append(rows)
+        self.numPending += len(rows)
+        if self.numPending > self.maxRows:
+            self._shed()
+        self.ready.set()
+
+    # All pending rows as one block, None when there are none
+    def take(self):
+        self.ready.clear()
+        if not self.pending:
+            return None
+        rows = self.pending[0] if len(self.pending) == 1 else np.concatenate(self.pending)
+        self.pending = []
+        self.numPending = 0
+        return rows
+
+    def close(self):
+        self.closing = True
+        self.ready.set()
+
+    def _shed(self):
+        rows = np.concatenate(self.pending)
+        if self.policy == 'drop':
+            kept = rows[-self.maxRows:]
+        else:
+            kept = rows
+            while len(kept) > self.maxRows:
+                kept = kept[(len(kept) - 1) % 2::2] # Always keeps the newest row
+        self.lost += len(rows) - len(kept)
+        self.pending = [kept]
+        self.numPending = len(kept)
+
+class SamplePublisher:
+
+    # address is 'host:port' or 'unix:path', metadata is added to the JSON layout every subscriber receives.
+    # A subscriber more than maxRows rows behind loses rows according to policy
+    def __init__(self, address, columns, metadata = None, maxRows = 10000, policy = 'drop'):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f'Unknown backpressure policy {policy}, expected one of {BACKPRESSURE_POLICIES}.')
+
+        self.address = address
+        self.columns = list(columns)
+        self.maxRows = maxRows
+        self.policy = policy
+
+        layout = json.dumps({'columns': self.columns, **(metadata or {})}).encode()
+        self.greeting = GREETING.pack(STREAM_MAGIC, STREAM_VERSION, len(layout)) + layout
+
+        self.subscriptions = set()
+        self.handlers = set()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target = self.loop.run_forever, name = 'publisher', daemon = True)
+        self.thread.start()
+
+        # Raises here if the address cannot be listened on
+        self.server = asyncio.run_coroutine_threadsafe(self._listen(), self.loop).result()
+        logging.info(f'Publishing rows on {address}.')
+
+    # Send a (rows, columns) block to every subscriber, called from the acquisition thread. Only schedules
+    # the block on the event loop and returns, the block must not be changed afterwards
+    def publish(self, rows):
+        self.loop.call_soon_threadsafe(self._broadcast, rows)
+
+    # Stop listening, send every subscriber its pending rows and disconnect it. Subscribers that do not
+    # take their rows within timeout seconds are cut off
+    def close(self, timeout = 5.0):
+        asyncio.run_coroutine_threadsafe(self._close(timeout), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+        host, path = parseAddress(self.address)
+        if host is None and os.path.exists(path):
+            os.remove(path)
+
+    async def _listen(self):
+        host, port = parseAddress(self.address)
+        if host is None:
+            return await asyncio.start_unix_server(self._serve, port)
+        return await asyncio.start_server(self._serve, host, port)
+
+    def _broadcast(self, rows):
+        for subscription in self.subscriptions:
+            subscription.add(rows)
+
+    async def _serve(self, reader, writer):
+        peer = writer.get_extra_info('peername') or self.address
+        subscription = Subscription(self.maxRows, self.policy)
+        self.subscriptions.add(subscription)
+        self.handlers.add(asyncio.current_task())
+        logging.info(f'Subscriber {peer} connected, {len(self.subscriptions)} subscribed.')
+
+        try:
+            writer.write(self.greeting)
+            while not subscription.closing or subscription.pending:
+                await subscription.ready.wait()
+                rows = subscription.take()
+                if rows is not None:
+                    writer.write(FRAME.pack(len(rows), subscription.lost) + rows.astype('<f8', copy = False).tobytes())
+
+                # Only this subscriber waits for its socket to drain, rows keep queueing up meanwhile
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscriptions.discard(subscription)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+        lost = f', {subscription.lost} rows were left out' if subscription.lost else ''
+        logging.info(f'Subscriber {peer} disconnected{lost}.')
+
+    async def _close(self, timeout):
+        self.server.close()
+        for subscription in self.subscriptions:
+            subscription.close()
+
+        if self.handlers:
+            _, stuck = await asyncio.wait(set(self.handlers), timeout = timeout)
+            for handler in stuck:
+                handler.cancel()
+            if stuck:
+                await asyncio.wait(stuck)
+
+# Blocking client of a SamplePublisher, reads one frame at a time
+class SampleSubscriber:
+
+    def __init__(self, address, timeout = None):
+        host, port = parseAddress(address)
+        if host is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(port)
+        else:
+            self.socket = socket.create_connection((host, port), timeout = timeout)
+        self.stream = self.socket.makefile('rb')
+
+        magic, version, layoutLength = GREETING.unpack(self._receive(GREETING.size))
+        if magic != STREAM_MAGIC:
+            raise ValueError(f'{address} is not a thermistor sample stream.')
+        if version > STREAM_VERSION:
+            raise ValueError(f'{address} streams version {version}, newer than the supported version {STREAM_VERSION}.')
+
+        self.layout = json.loads(self._receive(layoutLength))
+        self.columns = self.layout['columns']
+        self.lost = 0
+
+    # The rows of the next frame as a (rows, columns) array, or None once the publisher has closed the stream
+    def read(self):
+        try:
+            numRows, self.lost = FRAME.unpack(self._receive(FRAME.size))
+        except EOFError:
+            return None
+        values = self._receive(numRows * len(self.columns) * 8)
+        return np.frombuffer(values, dtype = '<f8').reshape(numRows, len(self.columns))
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def _receive(self, size):
+        data = self.stream.read(size)
+        if len(data) < size:
+            raise EOFError('The sample stream ended.')
+        return data
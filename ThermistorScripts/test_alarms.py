@@ -0,0 +1,33 @@
+# Tests of alarms on blocks with channels that have no reading
+import json
+import socket
+import warnings
+import numpy as np
+from alarms import AlarmEngine, DeviationRule, SensorRule, SocketAction
+
+def test_deviation_without_any_reading_is_quiet():
+    engine = AlarmEngine([DeviationRule({'type': 'deviation', 'max': 1.0}, ['1', '2', '3'])], [])
+    values = np.array([[20.0, 20.1, np.nan], [np.nan, np.nan, np.nan], [20.0, 25.0, 20.2]])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        events = engine.check(np.arange(3.0), values)
+
+    assert [(event['state'], event['channel'], event['time']) for event in events] == [('raised', '2', 2.0)]
+
+def test_socket_action_sends_strict_json():
+    def strict(constant):
+        raise ValueError(f'{constant} is not JSON')
+
+    with socket.create_server(('localhost', 0)) as server:
+        action = SocketAction({'address': f'localhost:{server.getsockname()[1]}'})
+        engine = AlarmEngine([SensorRule({'type': 'sensor'}, ['1', '2'])], [action])
+        engine.check(np.arange(2.0), np.full((2, 2), np.nan), np.array([[10000.0, np.nan], [10000.0, np.nan]]))
+
+        connection, _ = server.accept()
+        with connection, connection.makefile() as lines:
+            event = json.loads(lines.readline(), parse_constant = strict)
+        engine.close()
+
+    assert event['state'] == 'raised' and event['channel'] == '2'
+    assert event['value'] is None
@@ -0,0 +1,89 @@
+# Tests of the recorded columns, plot panels and coefficients a channel map describes, and of the
+# columns the data collection scripts record from it
+import json
+import pytest
+import numpy as np
+from channelMap import ChannelMap, loadChannelMap, DEFAULT_CHANNEL_MAP, CALIBRATION_CHANNEL_MAP
+from conversion import TOTAL_COEFFICIENTS
+
+DEVICES = [
+    {'name': 'Dev1', 'label': 'Black', 'channels': [0, 1, 2]},
+    {'name': 'Dev2', 'channels': [{'ai': 4, 'thermistor': 'T17'}, 5]},
+]
+
+def test_thermistors_are_numbered_in_map_order_unless_named():
+    channelMap = ChannelMap(DEVICES)
+
+    assert channelMap.thermistors == ['1', '2', '3', 'T17', '5']
+    assert channelMap.numChannels == 5
+    assert [device['channels'] for device in channelMap.devices] == [[0, 1, 2], [4, 5]]
+    assert channelMap.devices[1]['label'] == 'Dev2'
+
+def test_columns_follow_the_thermistors():
+    channelMap = ChannelMap(DEVICES)
+
+    assert channelMap.fieldNames(['utc (s)']) == ['time (s)', 'temp1', 'temp2', 'temp3', 'tempT17', 'temp5',
+                                                  'res1', 'res2', 'res3', 'resT17', 'res5', 'utc (s)']
+
+def test_every_device_gets_a_plot_panel_by_default():
+    channelMap = ChannelMap(DEVICES)
+
+    assert channelMap.plots == [('Black: thermistors 1 - 3', [0, 1, 2]), ('Dev2: thermistors T17 - 5', [3, 4])]
+
+def test_plot_panels_name_thermistors_on_any_device():
+    channelMap = ChannelMap(DEVICES, plots = [{'title': 'Inner ring', 'thermistors': ['T17', '1']}])
+
+    assert channelMap.plots == [('Inner ring', [3, 0])]
+
+def test_thermistor_on_two_channels_is_rejected():
+    devices = [{'name': 'Dev1', 'channels': [0, {'ai': 1, 'thermistor': '1'}]}]
+
+    with pytest.raises(ValueError, match = 'Thermistor 1 is on more than one channel'):
+        ChannelMap(devices)
+
+def test_plot_of_an_unknown_thermistor_is_rejected():
+    with pytest.raises(ValueError, match = 'not on any channel'):
+        ChannelMap(DEVICES, plots = [{'title': 'Outer ring', 'thermistors': ['1', 'T99']}])
+
+def test_coefficients_from_sets_and_the_coefficient_file(tmp_path):
+    fileName = tmp_path / 'coefficients.json'
+    fileName.write_text(json.dumps({'version': 1, 'thermistors': {'2': {'coefficients': [1e-3, 2e-4, 3e-7]}}}))
+    devices = [{'name': 'Dev1', 'channels': [0, 1, {'ai': 2, 'coefficients': 'custom'}]}]
+
+    channelMap = ChannelMap(devices, {'custom': [4e-3, 5e-4, 6e-7]}, coefficientFile = str(fileName))
+
+    assert np.allclose(channelMap.coefficients, [TOTAL_COEFFICIENTS, [1e-3, 2e-4, 3e-7], [4e-3, 5e-4, 6e-7]])
+
+def test_unknown_coefficient_set_is_rejected():
+    with pytest.raises(ValueError, match = 'No coefficient sets'):
+        ChannelMap([{'name': 'Dev1', 'channels': [{'ai': 0, 'coefficients': 'missing'}]}])
+
+def test_newer_map_version_is_rejected(tmp_path):
+    fileName = tmp_path / 'map.json'
+    fileName.write_text(json.dumps({'version': 2, 'devices': DEVICES}))
+
+    with pytest.raises(ValueError, match = 'newer than the supported version'):
+        loadChannelMap(str(fileName))
+
+def test_default_maps():
+    assert loadChannelMap(DEFAULT_CHANNEL_MAP).numChannels == 24
+    calibrationMap = loadChannelMap(CALIBRATION_CHANNEL_MAP)
+    assert calibrationMap.thermistors == [str(i) for i in range(1, 9)]
+    assert [device['name'] for device in calibrationMap.devices] == ['Dev1']
+
+# The calibration scripts record the same columns from the default calibration map as before they used one
+def test_calibration_scripts_columns_from_the_map():
+    from calTest import CalibrationTest
+    from calibration import Calibration
+
+    channelMap = loadChannelMap(CALIBRATION_CHANNEL_MAP)
+    calTest = CalibrationTest()
+    calTest.channelMap = channelMap
+    calTest.thermistors = channelMap.thermistors
+    calibration = Calibration()
+    calibration.channelMap = channelMap
+
+    ids = range(1, 9)
+    assert calTest.columns() == [f'ind{i}' for i in ids] + [f'total{i}' for i in ids] + [f'dif{i}' for i in ids] + [f'res{i}' for i in ids]
+    assert calibration.columns() == [f'res{i} (ohm)' for i in ids]
+    assert calibration.readingNames() == [f'res{i}' for i in ids]
@@ -0,0 +1,36 @@
+# Tests of the voltage to temperature conversion for channels without a valid reading
+import warnings
+import numpy as np
+from conversion import convert, resistance, steinhartHart, lookupTable, coefficientMatrix, TOTAL_COEFFICIENTS, VOLT_IN
+
+# One good, one open (full supply) and one shorted (0 V) channel
+VOLTS = np.array([[2.5, VOLT_IN, 0.0], [2.4, VOLT_IN + 0.1, -0.1]])
+
+def test_open_and_shorted_channels_are_nan():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        temps, res = convert(VOLTS, coefficientMatrix(TOTAL_COEFFICIENTS, 3))
+
+    assert np.isfinite(temps[:, 0]).all() and np.isfinite(res[:, 0]).all()
+    assert np.isnan(temps[:, 1:]).all()
+    assert np.isnan(res[:, 1:]).all()
+
+def test_lookup_table_open_and_shorted_channels_are_nan():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        temps, res = lookupTable(TOTAL_COEFFICIENTS).convert(VOLTS)
+
+    assert np.isfinite(temps[:, 0]).all()
+    assert np.isnan(temps[:, 1:]).all()
+    assert np.isnan(res[:, 1:]).all()
+
+def test_invalid_resistances_are_nan():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        temps = steinhartHart(np.array([10000.0, np.inf, 0.0, -5.0, np.nan]), TOTAL_COEFFICIENTS)
+
+    assert np.isfinite(temps[0])
+    assert np.isnan(temps[1:]).all()
+
+def test_resistance_of_a_valid_reading():
+    assert np.isclose(resistance(2.5), 10000)
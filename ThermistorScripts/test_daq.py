@@ -0,0 +1,36 @@
+# Tests of the acquisition buffer size and of overrun detection in buffered acquisition
+import time
+import pytest
+from daq import DeviceGroup, BufferOverrunError, bufferSize
+from simulation import SimulatedDevice
+
+def test_buffer_holds_whole_blocks_of_the_given_seconds():
+    assert bufferSize(100, 10, 10.0) == 1000
+    assert bufferSize(1000, 300, 1.0) == 1200
+    assert bufferSize(100, 30, 0.1) == 60
+
+def test_reads_that_keep_up_do_not_overrun():
+    device = SimulatedDevice('Sim', range(2), seed = 0)
+    device.configureBuffered(1000, 10, 0.05)
+    device.start()
+
+    for block in range(10):
+        assert device.readBlock().shape == (2, 10)
+    assert device.samplesRead == 100
+
+def test_reads_falling_a_whole_buffer_behind_overrun():
+    device = SimulatedDevice('Sim', range(2), seed = 0)
+    device.configureBuffered(1000, 10, 0.05)
+    device.start()
+    device.readBlock()
+
+    time.sleep(0.1)
+    with pytest.raises(BufferOverrunError):
+        device.readBlock()
+
+def test_group_configures_every_device_with_the_buffer_seconds():
+    group = DeviceGroup([SimulatedDevice('Sim1', range(2)), SimulatedDevice('Sim2', range(3))])
+    group.configureBuffered(200, 20, 5.0)
+
+    assert [device.bufferSize for device in group.devices] == [1000, 1000]
+    group.close()
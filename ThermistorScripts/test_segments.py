@@ -0,0 +1,78 @@
+# Tests of resuming a segmented recording that was cut short in the middle of a row
+import os
+import pytest
+import numpy as np
+from segments import SegmentedRecorder, readManifest, readSegments, segmentPath
+
+COLUMNS = ['time (s)', 'temp1', 'utc (s)']
+
+def rows(first, count):
+    times = np.arange(first, first + count, dtype = float)
+    return np.column_stack((times, 20 + times / 10, 1.7e9 + times))
+
+# A recorder that crashes: its rows reach the file but it is never closed, and the last row is half written
+def crash(recorder, partial):
+    recorder.flush()
+    path = segmentPath(recorder.fileName, recorder.manifest['active'])
+    with open(path, 'ab') as segmentFile:
+        segmentFile.write(partial)
+    return path
+
+@pytest.mark.parametrize('fileFormat, partial', [('csv', b'7,20.7,17000'), ('binary', bytes(10))])
+def test_resume_drops_the_partial_row(tmp_path, fileFormat, partial):
+    fileName = str(tmp_path / 'run.csv')
+    recorder = SegmentedRecorder(fileName, COLUMNS, fileFormat, segmentSeconds = 3, startUtc = 1.7e9)
+    for first in range(0, 7):
+        recorder.write(rows(first, 1))
+    path = crash(recorder, partial)
+
+    resumed = SegmentedRecorder(fileName, COLUMNS, fileFormat, resume = True)
+    assert resumed.startUtc == 1.7e9
+    manifest = readManifest(fileName)
+    assert [segment['rows'] for segment in manifest['segments']] == [4, 3]
+    assert manifest['segments'][-1]['end time'] == 6
+    assert os.path.basename(path) == manifest['segments'][-1]['file']
+
+    # Binary recordings keep the readings as float32
+    resumed.write(rows(7, 3))
+    resumed.close()
+    recorded = readSegments(fileName)
+    assert np.array_equal(recorded[:, 0], np.arange(10.0))
+    assert np.allclose(recorded, rows(0, 10), rtol = 1e-6)
+
+def test_resume_removes_an_empty_interrupted_segment(tmp_path):
+    fileName = str(tmp_path / 'run.csv')
+    recorder = SegmentedRecorder(fileName, COLUMNS, segmentSeconds = 2)
+    recorder.write(rows(0, 3))
+    crash(recorder, b'3,20.3')
+
+    resumed = SegmentedRecorder(fileName, COLUMNS, resume = True)
+    assert [segment['rows'] for segment in resumed.manifest['segments']] == [3]
+    assert np.array_equal(readSegments(fileName), rows(0, 3))
+
+    resumed.write(rows(3, 2))
+    resumed.close()
+    assert np.array_equal(readSegments(fileName), rows(0, 5))
+
+def test_resume_with_other_columns_is_rejected(tmp_path):
+    fileName = str(tmp_path / 'run.csv')
+    recorder = SegmentedRecorder(fileName, COLUMNS)
+    recorder.write(rows(0, 2))
+    recorder.close()
+
+    with pytest.raises(ValueError, match = 'different columns'):
+        SegmentedRecorder(fileName, COLUMNS[:2], resume = True)
+
+def test_start_utc_is_set_for_a_new_run_only(tmp_path):
+    fileName = str(tmp_path / 'run.csv')
+    recorder = SegmentedRecorder(fileName, COLUMNS)
+    recorder.setStartUtc(1.7e9)
+    recorder.write(rows(0, 2))
+    recorder.close()
+    assert readManifest(fileName)['start utc'] == 1.7e9
+
+    resumed = SegmentedRecorder(fileName, COLUMNS, resume = True)
+    resumed.setStartUtc(1.8e9)
+    resumed.close()
+    assert resumed.startUtc == 1.7e9
+    assert readManifest(fileName)['start utc'] == 1.7e9
@@ -0,0 +1,21 @@
+# Tests of the signal settings of simulated devices
+import json
+from simulation import SimulatedDevice, loadSimulation
+
+def test_channel_overrides_a_defaulted_setting():
+    device = SimulatedDevice('Sim', range(3), default = {'noise': 0.001, 'temperature': 25.0}, signals = {1: {'noise': 0.002}})
+
+    assert device.noise[:, 0].tolist() == [0.001, 0.002, 0.001]
+    assert device.temperature[:, 0].tolist() == [25.0, 25.0, 25.0]
+
+def test_simulation_file_overrides_a_defaulted_setting(tmp_path):
+    fileName = tmp_path / 'simulation.json'
+    fileName.write_text(json.dumps({'default': {'noise': 0.001, 'fault': 'short'}, 'devices': {'Dev1': {'2': {'noise': 0.002, 'fault': None}}}}))
+
+    device = SimulatedDevice('Dev1', range(4), **loadSimulation(str(fileName)).deviceOptions('Dev1'))
+    assert device.noise[:, 0].tolist() == [0.001, 0.001, 0.002, 0.001]
+    assert device.short.tolist() == [True, True, False, True]
+
+    device.start()
+    volts = device.read()
+    assert (volts[[0, 1, 3]] == 0).all() and volts[2] > 0
@@ -0,0 +1,82 @@
+# Tests of the framing of the sample stream and of the rows slow subscribers lose
+import json
+import socket
+import struct
+import numpy as np
+from streaming import SamplePublisher, SampleSubscriber, Subscription, GREETING, FRAME, STREAM_MAGIC, STREAM_VERSION
+
+COLUMNS = ['time (s)', 'temp1', 'temp2']
+
+def rows(first, count):
+    times = np.arange(first, first + count, dtype = float)
+    return np.column_stack((times, 20 + times, 21 + times))
+
+# Every row the subscriber reads until it has count of them
+def readRows(subscriber, count):
+    blocks = []
+    while sum(len(block) for block in blocks) < count:
+        blocks.append(subscriber.read())
+    return np.concatenate(blocks)
+
+def publisherPort(publisher):
+    return publisher.server.sockets[0].getsockname()[1]
+
+def test_greeting_and_frames_on_the_wire():
+    publisher = SamplePublisher('localhost:0', COLUMNS, {'thermistors': ['1', '2']})
+    with socket.create_connection(('localhost', publisherPort(publisher)), timeout = 5) as connection, connection.makefile('rb') as stream:
+        magic, version, layoutLength = GREETING.unpack(stream.read(GREETING.size))
+        assert (magic, version) == (STREAM_MAGIC, STREAM_VERSION)
+        assert json.loads(stream.read(layoutLength)) == {'columns': COLUMNS, 'thermistors': ['1', '2']}
+
+        publisher.publish(rows(0, 2))
+        numRows, lost = struct.unpack('<QQ', stream.read(FRAME.size))
+        assert (numRows, lost) == (2, 0)
+        values = np.frombuffer(stream.read(numRows * len(COLUMNS) * 8), dtype = '<f8').reshape(numRows, len(COLUMNS))
+        assert np.array_equal(values, rows(0, 2))
+
+        publisher.close()
+        assert stream.read() == b''
+
+def test_subscriber_reads_every_published_row():
+    publisher = SamplePublisher('localhost:0', COLUMNS)
+    subscriber = SampleSubscriber(f'localhost:{publisherPort(publisher)}', timeout = 5)
+    assert subscriber.columns == COLUMNS
+
+    for first in range(0, 30, 3):
+        publisher.publish(rows(first, 3))
+    assert np.array_equal(readRows(subscriber, 30), rows(0, 30))
+    assert subscriber.lost == 0
+
+    publisher.close()
+    assert subscriber.read() is None
+    subscriber.close()
+
+def test_unix_socket_stream(tmp_path):
+    address = f'unix:{tmp_path / "stream.sock"}'
+    publisher = SamplePublisher(address, COLUMNS)
+    subscriber = SampleSubscriber(address, timeout = 5)
+
+    publisher.publish(rows(0, 5))
+    assert np.array_equal(readRows(subscriber, 5), rows(0, 5))
+
+    publisher.close()
+    subscriber.close()
+    assert not (tmp_path / 'stream.sock').exists()
+
+def test_drop_policy_keeps_the_newest_rows():
+    subscription = Subscription(4, 'drop')
+    subscription.add(rows(0, 3))
+    subscription.add(rows(3, 3))
+
+    assert np.array_equal(subscription.take(), rows(2, 4))
+    assert subscription.lost == 2
+
+def test_coalesce_policy_keeps_the_whole_span_and_the_newest_row():
+    subscription = Subscription(4, 'coalesce')
+    subscription.add(rows(0, 10))
+
+    kept = subscription.take()
+    assert len(kept) <= 4
+    assert kept[-1, 0] == 9
+    assert np.all(np.diff(kept[:, 0]) > 0)
+    assert subscription.lost == 10 - len(kept)
@@ -0,0 +1,117 @@
+# Tests of the stage statistics and missed deadlines of the stage timers
+import pytest
+import numpy as np
+import timing
+from timing import StageTimer, NullTimer, stageTimer
+
+# Stands in for time.perf_counter, advanced by hand
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(timing.time, 'perf_counter', fake)
+    return fake
+
+# One cycle of stages taking the given seconds each
+def runCycle(timer, clock, durations):
+    timer.start()
+    for stage, duration in zip(timer.stages, durations):
+        clock.now += duration
+        timer.mark(stage)
+    timer.end()
+
+def test_percentiles_of_every_stage_and_the_cycle(clock):
+    timer = StageTimer('test', ['read', 'convert'], deadline = 1.0)
+    for cycle in range(1, 101):
+        runCycle(timer, clock, [cycle * 1e-3, 0.5e-3])
+
+    summary = timer.summary()
+    assert summary['cycles'] == 100
+    read = summary['stages']['read']
+    assert read['p50 (s)'] == pytest.approx(np.percentile(np.arange(1, 101) * 1e-3, 50))
+    assert read['p99 (s)'] == pytest.approx(np.percentile(np.arange(1, 101) * 1e-3, 99))
+    assert read['max (s)'] == pytest.approx(0.1)
+    assert summary['stages']['convert']['max (s)'] == pytest.approx(0.5e-3)
+    assert summary['stages']['cycle']['max (s)'] == pytest.approx(0.1005)
+
+def test_cycles_over_the_deadline_are_counted(clock):
+    timer = StageTimer('test', ['read', 'record'], deadline = 0.1)
+    for durations in ([0.01, 0.01], [0.05, 0.06], [0.2, 0.0], [0.09, 0.0]):
+        runCycle(timer, clock, durations)
+
+    assert timer.summary()['missed deadlines'] == 2
+
+def test_waiting_for_data_does_not_count_towards_the_deadline(clock):
+    timer = StageTimer('test', ['read', 'record'], deadline = 0.1, waitStage = 'read')
+    for durations in ([0.5, 0.01], [0.5, 0.2]):
+        runCycle(timer, clock, durations)
+
+    assert timer.summary()['missed deadlines'] == 1
+
+def test_statistics_only_cover_the_window(clock):
+    timer = StageTimer('test', ['read'], window = 10)
+    for cycle in range(20):
+        runCycle(timer, clock, [1.0 if cycle < 10 else 0.001])
+
+    summary = timer.summary()
+    assert summary['cycles'] == 20
+    assert summary['stages']['read']['max (s)'] == pytest.approx(0.001)
+
+def test_stages_not_marked_in_a_cycle_are_left_out(clock):
+    timer = StageTimer('test', ['update', 'redraw'])
+    timer.start()
+    clock.now += 0.01
+    timer.mark('update')
+    timer.end()
+
+    assert list(timer.summary()['stages']) == ['update', 'cycle']
+
+def test_disabled_timer_does_nothing():
+    timer = stageTimer('test', ['read'], 0.1, enabled = False)
+    assert isinstance(timer, NullTimer)
+    timer.start()
+    timer.mark('read')
+    timer.end()
+
+def test_redraw_and_blit_are_timed_as_plot_stages(clock):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from plotting import LivePlot, redraw, timedAnimation
+
+    fig, ax = plt.subplots()
+    livePlot = LivePlot(fig)
+    livePlot.addAxis(ax, [0], ['Thermistor 1'])
+    timer = StageTimer('plot', ['update', 'redraw', 'blit'], deadline = 0.5)
+    draws = []
+    fig.canvas.mpl_connect('draw_event', draws.append)
+
+    def animate(frame):
+        lines = livePlot.update(np.arange(5.0) + 10 * frame, np.full((5, 1), 20.0 + frame))
+        timer.mark('update')
+        clock.now += 1.0 if redraw(fig, livePlot) else 0.0
+        timer.mark('redraw')
+        return lines
+
+    ani = timedAnimation(fig, animate, timer, frames = 3, init_func = livePlot.init, cache_frame_data = False)
+    fig.canvas.draw()
+    drawsBefore = len(draws)
+    for frame in range(2):
+        ani._step()
+
+    # Both frames moved the limits, so both drew the whole figure and missed the deadline
+    summary = timer.summary()
+    assert summary['cycles'] == 2
+    assert len(draws) - drawsBefore == 2
+    assert summary['missed deadlines'] == 2
+    assert summary['stages']['redraw']['p50 (s)'] == pytest.approx(1.0)
+    assert 'blit' in summary['stages']
+    assert not livePlot.stale
+    plt.close(fig)
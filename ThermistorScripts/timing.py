@@ -0,0 +1,116 @@
+# Per stage timing of a repeated cycle, such as one acquisition or one plot refresh, with rolling
+# statistics, a count of cycles that took longer than their deadline and a periodic summary
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+
+class StageTimer:
+
+    # stages are the names passed to mark() in the order they run, deadline is the longest a whole cycle
+    # may take in seconds, not counting waitStage if that stage only waits for data to arrive.
+    # Statistics cover the last window cycles
+    def __init__(self, name, stages, deadline = None, waitStage = None, window = 1000):
+        self.name = name
+        self.stages = list(stages)
+        self.deadline = deadline
+        self.waitIndex = None if waitStage is None else self.stages.index(waitStage)
+
+        # One row per cycle, one column per stage plus the whole cycle
+        self.durations = np.full((window, len(self.stages) + 1), np.nan)
+        self.stageIndex = {stage: index for index, stage in enumerate(self.stages)}
+        self.index = 0
+        self.cycles = 0
+        self.missed = 0
+
+        self.cycleStart = self.lastMark = time.perf_counter()
+
+    # Call at the start of every cycle
+    def start(self):
+        self.cycleStart = self.lastMark = time.perf_counter()
+
+    # Call when stage has finished, it is timed from the previous mark() or start()
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.durations[self.index, self.stageIndex[stage]] = now - self.lastMark
+        self.lastMark = now
+
+    # Call at the end of every cycle
+    def end(self):
+        total = time.perf_counter() - self.cycleStart
+        self.durations[self.index, -1] = total
+
+        busy = total if self.waitIndex is None else total - np.nan_to_num(self.durations[self.index, self.waitIndex])
+        if self.deadline and busy > self.deadline:
+            self.missed += 1
+        self.cycles += 1
+        self.index = (self.index + 1) % len(self.durations)
+        self.durations[self.index] = np.nan
+
+    # Rolling p50, p99 and max in seconds of every stage and the whole cycle
+    def summary(self):
+        durations = self.durations.copy()
+        stats = {}
+        for index, stage in enumerate(self.stages + ['cycle']):
+            values = durations[:, index]
+            values = values[~np.isnan(values)]
+            if len(values):
+                p50, p99 = np.percentile(values, [50, 99])
+                stats[stage] = {'p50 (s)': p50, 'p99 (s)': p99, 'max (s)': values.max()}
+
+        return {'cycles': self.cycles, 'missed deadlines': self.missed, 'deadline (s)': self.deadline, 'stages': stats}
+
+# Stands in for StageTimer when timing is turned off, every call does nothing
+class NullTimer:
+
+    def start(self):
+        pass
+
+    def mark(self, stage):
+        pass
+
+    def end(self):
+        pass
+
+# StageTimer, or a NullTimer if not enabled
+def stageTimer(name, stages, deadline = None, enabled = True, waitStage = None):
+    return StageTimer(name, stages, deadline, waitStage) if enabled else NullTimer()
+
+# Logs a summary of every timer each interval seconds and, if fileName is given, also writes it to
+# that JSON metrics file. The file is replaced in one step so readers never see a partial file
+class TimingReporter(threading.Thread):
+
+    def __init__(self, timers, interval = 10.0, fileName = None):
+        super().__init__(name = 'timing', daemon = True)
+        self.timers = [timer for timer in timers if isinstance(timer, StageTimer)]
+        self.interval = interval
+        self.fileName = fileName
+        self.stopEvent = threading.Event()
+
+    def run(self):
+        while not self.stopEvent.wait(self.interval):
+            self.report()
+
+    def report(self):
+        summaries = {timer.name: timer.summary() for timer in self.timers}
+
+        for name, summary in summaries.items():
+            if summary['cycles'] == 0:
+                continue
+            stages = ', '.join(f'{stage} {stats["p50 (s)"] * 1e3:.2f}/{stats["p99 (s)"] * 1e3:.2f}/{stats["max (s)"] * 1e3:.2f}'
+                               for stage, stats in summary['stages'].items())
+            logging.info(f'{name} timing p50/p99/max ms: {stages}; {summary["missed deadlines"]} of {summary["cycles"]} cycles missed their deadline.')
+
+        if self.fileName:
+            temporaryName = self.fileName + '.tmp'
+            with open(temporaryName, 'w') as metricsFile:
+                json.dump({'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'timers': summaries}, metricsFile, indent = 4, default = float)
+            os.replace(temporaryName, self.fileName)
+
+    # Stop reporting, with one last report of the whole run
+    def stop(self):
+        self.stopEvent.set()
+        self.join()
+        self.report()
@@ -0,0 +1,111 @@
+# Script used to plot a recording made by the data collection scripts, either following it live while
+# it is being recorded, for example by a --headless run, or rendering the whole recording to an image.
+# With --shared it follows the shared memory ring of a run started with --shared_ring instead of the file
+import argparse
+import logging
+from ringBuffer import RingBuffer
+from history import MinMaxHistory
+from plotting import LivePlot, redraw
+from recording import RecordingFollower, BOOKKEEPING_COLUMNS
+from segments import SegmentFollower, isSegmented
+from sharedRing import SharedRingReader
+
+CHANNELS_PER_AXIS = 8
+
+# Animation initialization script
+def init():
+    return livePlot.init() + historyPlot.init()
+
+# Add the rows recorded since the last frame and redraw the lines
+def animate(frame):
+    rows = follower.read()
+    if len(rows):
+        plotBuffer.extend(rows[:, 0], rows[:, indices])
+        historyBuffer.extend(rows[:, 0], rows[:, indices])
+
+    t, window = plotBuffer.window()
+    lines = livePlot.update(t, window) + historyPlot.update(*historyBuffer.window())
+    redraw(fig, livePlot, historyPlot)
+    return lines
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(description = 'Thermistor Recording Viewer')
+parser.add_argument('file_name',                help = 'CSV, binary or segmented recording to plot, or the ring name with --shared.')
+parser.add_argument('-c', '--columns',          help = 'Names of the columns to plot, defaults to every measured column.', nargs = '+')
+parser.add_argument('-w', '--window_length',    help = 'Number of most recent samples shown while following a recording.', type = int, default = 500)
+parser.add_argument('--history_length',         help = 'Number of min/max buckets the whole recording is shown with next to the recent samples.', type = int, default = 1000)
+parser.add_argument('-p', '--plot_interval',    help = 'Interval between each plot refresh, in seconds.', type = float, default = 1.0)
+parser.add_argument('-s', '--save',             help = 'Render the whole recording into this image file instead of following it in a window.')
+parser.add_argument('--shared',                 help = 'Read the rows from the shared memory ring named file_name of a run started with --shared_ring, only the rows still in the ring are shown with --save.', action = 'store_true')
+
+args = parser.parse_args()
+
+# Configuring the logger
+logging.basicConfig(format = '[ %(levelname)s ]: %(message)s', level = logging.INFO)
+
+# Every follower returns the rows added since the previous read, a segmented recording is followed across its segments
+if args.shared:
+    follower = SharedRingReader(args.file_name)
+elif isSegmented(args.file_name):
+    follower = SegmentFollower(args.file_name)
+else:
+    follower = RecordingFollower(args.file_name)
+columns = args.columns or [name for name in follower.columns[1:] if name not in BOOKKEEPING_COLUMNS]
+for name in columns:
+    if name not in follower.columns:
+        parser.error(f'{args.file_name} has no column {name}, its columns are {", ".join(follower.columns)}.')
+indices = [follower.columns.index(name) for name in columns]
+
+# Up to CHANNELS_PER_AXIS columns on each axis, stacked vertically
+groups = [columns[start:start + CHANNELS_PER_AXIS] for start in range(0, len(columns), CHANNELS_PER_AXIS)]
+
+# Rendering to a file does not need a display
+import matplotlib
+if args.save:
+    matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+# Following a recording shows the recent samples on the left and the whole recording on the right
+numColumns = 1 if args.save else 2
+fig, axes = plt.subplots(len(groups), numColumns, sharex = 'col', squeeze = False, figsize = (14 + 8 * (numColumns - 1), 3.5 * len(groups)))
+historyAxes = axes[:, -1]
+axes = axes[:, 0]
+
+if args.save:
+    rows = follower.read()
+    logging.info(f'Rendering {len(rows)} rows of {args.file_name} to {args.save}.')
+
+    for ax, group in zip(axes, groups):
+        for name in group:
+            ax.plot(rows[:, 0], rows[:, follower.columns.index(name)], linewidth = 1, label = name)
+        ax.legend(loc = 'upper left')
+        ax.grid()
+    axes[-1].set_xlabel(follower.columns[0])
+
+    fig.savefig(args.save)
+
+else:
+    logging.info(f'Following {args.file_name}, close the plot window to stop.')
+
+    # Buffers of the most recent rows and of the whole recording of the plotted columns, filled from the recording
+    plotBuffer = RingBuffer(len(columns), args.window_length)
+    historyBuffer = MinMaxHistory(len(columns), args.history_length)
+
+    livePlot = LivePlot(fig)
+    historyPlot = LivePlot(fig)
+    first = 0
+    for ax, historyAx, group in zip(axes, historyAxes, groups):
+        livePlot.addAxis(ax, range(first, first + len(group)), group, marker = 'o', markersize = 2)
+        historyPlot.addAxis(historyAx, range(first, first + len(group)), group, linewidth = 1)
+        first += len(group)
+        ax.legend(loc = 'upper left')
+        ax.grid()
+        historyAx.grid()
+    axes[0].set_title('Recent samples')
+    historyAxes[0].set_title('Whole recording, min/max envelope')
+    axes[-1].set_xlabel(follower.columns[0])
+    historyAxes[-1].set_xlabel(follower.columns[0])
+
+    ani = FuncAnimation(fig, animate, init_func = init, interval = int(args.plot_interval * 1000), blit = True, cache_frame_data = False)
+    plt.show()